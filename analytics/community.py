@@ -0,0 +1,189 @@
+"""
+Community detection for the cluster-aggregated graph view.
+
+Communities are found with a vectorized Louvain method on the undirected
+citation and co-authorship graph. Each local-move pass evaluates the
+modularity gain of every node joining every neighbouring community with one
+sparse product; a random half of the improving nodes move per pass so that
+simultaneous moves do not oscillate. Communities are then collapsed into
+supernodes and the next level runs on the smaller graph.
+"""
+
+import numpy as np
+import scipy.sparse as sp
+
+from analytics.layout import force_layout, symmetric_adjacency
+
+COMMUNITY_EDGE_TYPES = ('cites', 'wrote')
+
+def _membership(labels, count):
+    """Node-by-community indicator matrix."""
+    n = len(labels)
+    return sp.csr_matrix((np.ones(n), (np.arange(n), labels)), shape=(n, count))
+
+def _local_moves(adjacency, labels, rng, max_iter=50, tol=1.0e-2):
+    """Move nodes between communities while modularity improves.
+
+    Stops when at most `tol` of the nodes would still move.
+    """
+    n = adjacency.shape[0]
+    degree = np.asarray(adjacency.sum(axis=1)).ravel()
+    two_m = degree.sum()
+    if two_m == 0:
+        return labels
+    links = (adjacency - sp.diags(adjacency.diagonal())).tocsr()
+    links.eliminate_zeros()
+
+    for _ in range(max_iter):
+        totals = np.bincount(labels, weights=degree, minlength=n)
+        votes = (links @ _membership(labels, n)).tocoo()
+        rows, cols, weights = votes.row, votes.col, votes.data
+        own = cols == labels[rows]
+        # Gain of joining a community, not counting the node's own degree
+        gain = weights - degree[rows] * (totals[cols] - own * degree[rows]) / two_m
+        current = -degree * (totals[labels] - degree) / two_m
+        current[rows[own]] = gain[own]
+
+        order = np.lexsort((cols, -gain, rows))
+        rows, cols, gain = rows[order], cols[order], gain[order]
+        first = np.ones(len(rows), dtype=bool)
+        first[1:] = rows[1:] != rows[:-1]
+        rows, cols, gain = rows[first], cols[first], gain[first]
+
+        better = gain > current[rows] + 1.0e-12
+        best = labels.copy()
+        best[rows[better]] = cols[better]
+        wanted = best != labels
+        if wanted.sum() <= tol * n:
+            break
+        moving = wanted & (rng.random(n) < 0.5)
+        labels[moving] = best[moving]
+    return labels
+
+def louvain(adjacency, labels=None, seed=0, max_levels=10):
+    """Community label for every node of a symmetric weighted adjacency matrix.
+
+    `labels` optionally seeds the first level, e.g. with the previous result.
+    """
+    rng = np.random.default_rng(seed)
+    n = adjacency.shape[0]
+    result = np.arange(n)
+    level_labels = np.arange(n) if labels is None else np.asarray(labels).copy()
+    graph = adjacency.tocsr()
+    for _ in range(max_levels):
+        level_labels = _local_moves(graph, level_labels, rng)
+        _, level_labels = np.unique(level_labels, return_inverse=True)
+        count = level_labels.max() + 1 if len(level_labels) else 0
+        result = level_labels[result]
+        if count == graph.shape[0]:
+            break
+        membership = _membership(level_labels, count)
+        graph = (membership.T @ graph @ membership).tocsr()
+        level_labels = np.arange(count)
+    return result
+
+def modularity(adjacency, labels):
+    """Newman modularity of a partition."""
+    degree = np.asarray(adjacency.sum(axis=1)).ravel()
+    two_m = degree.sum()
+    if two_m == 0:
+        return 0.0
+    membership = _membership(labels, labels.max() + 1)
+    internal = (membership.T @ adjacency @ membership).diagonal().sum()
+    totals = membership.T @ degree
+    return float((internal - (totals ** 2).sum() / two_m) / two_m)
+
+def compute_communities(matrices, previous=None):
+    """Analytics job: communities of all nodes plus the aggregated cluster graph."""
+    n = matrices.num_nodes
+    node_ids = matrices.node_ids
+
+    src, dst = [], []
+    for edge_type in COMMUNITY_EDGE_TYPES:
+        edge_src, edge_dst = matrices.edges_of_type(edge_type)
+        src.append(edge_src)
+        dst.append(edge_dst)
+    src, dst = np.concatenate(src), np.concatenate(dst)
+    adjacency = sp.csr_matrix((np.ones(len(src)), (src, dst)), shape=(n, n))
+    adjacency = adjacency + adjacency.T
+    adjacency.data[:] = 1.0
+
+    seed_labels = None
+    if previous is not None:
+        # Warm start: keep previous communities, new nodes start on their own
+        old = dict(zip(previous['node_ids'], previous['labels'].tolist()))
+        fresh = iter(range(len(previous['sizes']), len(previous['sizes']) + n))
+        seed_labels = np.array([old[node] if node in old else next(fresh) for node in node_ids])
+    labels = louvain(adjacency, labels=seed_labels)
+
+    # Nodes outside the citation/co-authorship graph (e.g. journals) join the
+    # community most of their neighbours belong to
+    isolated = np.asarray(adjacency.sum(axis=1)).ravel() == 0
+    all_edges = sp.csr_matrix((np.ones(len(matrices.src)), (matrices.src, matrices.dst)), shape=(n, n))
+    all_edges = (all_edges + all_edges.T).tocsr()
+    if isolated.any():
+        count = labels.max() + 1
+        votes = (all_edges[isolated] @ _membership(labels, count)).tocoo()
+        order = np.lexsort((votes.col, -votes.data, votes.row))
+        rows, cols = votes.row[order], votes.col[order]
+        first = np.ones(len(rows), dtype=bool)
+        first[1:] = rows[1:] != rows[:-1]
+        isolated_nodes = np.flatnonzero(isolated)
+        labels[isolated_nodes[rows[first]]] = cols[first]
+
+    # Number communities by size, largest first
+    _, labels = np.unique(labels, return_inverse=True)
+    sizes = np.bincount(labels)
+    rank = np.empty(len(sizes), dtype=np.int64)
+    rank[np.argsort(-sizes, kind='stable')] = np.arange(len(sizes))
+    labels = rank[labels]
+    sizes = np.bincount(labels)
+    count = len(sizes)
+
+    members = np.argsort(labels, kind='stable')
+    member_indptr = np.concatenate([[0], np.cumsum(sizes)])
+    degree = np.asarray(all_edges.sum(axis=1)).ravel()
+
+    # Representative node: the best-connected member, preferring papers
+    papers = matrices.nodes_of_type('paper')
+    is_paper = np.zeros(n, dtype=bool)
+    is_paper[papers] = True
+    order = np.lexsort((-degree, ~is_paper, labels))
+    first = np.ones(n, dtype=bool)
+    first[1:] = labels[order][1:] != labels[order][:-1]
+    representatives = order[first]
+
+    membership = _membership(labels, count)
+    type_counts = (membership.T @ _membership(matrices.node_types, len(matrices.node_type_names))).toarray()
+    directed = sp.csr_matrix((np.ones(len(matrices.src)), (matrices.src, matrices.dst)), shape=(n, n))
+    cluster_edges = (membership.T @ directed @ membership).tocoo()
+    between = cluster_edges.row != cluster_edges.col
+    cluster_adjacency = symmetric_adjacency(cluster_edges.row[between], cluster_edges.col[between],
+                                            count, cluster_edges.data[between])
+    # Heavily linked clusters are drawn close, without letting one link dominate
+    cluster_adjacency.data = np.log1p(cluster_adjacency.data)
+
+    return {
+        'node_ids': node_ids,
+        'labels': labels,
+        'sizes': sizes,
+        'members': members,
+        'member_indptr': member_indptr,
+        'degree': degree,
+        'representatives': [node_ids[i] for i in representatives],
+        'type_counts': type_counts,
+        'type_names': list(matrices.node_type_names),
+        'edges': (cluster_edges.row[between], cluster_edges.col[between], cluster_edges.data[between]),
+        'positions': force_layout(cluster_adjacency, iterations=200),
+        'modularity': modularity(adjacency, labels)
+    }
+
+def cluster_members(communities, cluster, limit):
+    """Up to `limit` best-connected node ids of one community."""
+    if not 0 <= cluster < len(communities['sizes']):
+        return []
+    start, stop = communities['member_indptr'][cluster], communities['member_indptr'][cluster + 1]
+    members = communities['members'][start:stop]
+    if len(members) > limit:
+        members = members[np.argsort(-communities['degree'][members], kind='stable')[:limit]]
+    return [communities['node_ids'][i] for i in members.tolist()]
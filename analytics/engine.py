@@ -0,0 +1,114 @@
+"""
+Background computation of graph analytics, cached per graph version.
+
+Jobs are registered by name and run on a single worker thread. A job receives
+the GraphMatrices export of the current graph and its own previous result (for
+warm starts). Requests are answered from the cache when the result matches
+the current graph version; otherwise a recomputation is scheduled and the
+request waits up to `max_wait` seconds before falling back to the stale result.
+
+Jobs and the matrix export need numpy and scipy, which take longer to import
+than the rest of the application. They are imported when the first job runs,
+so processes start serving without them.
+"""
+
+import importlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from monitoring.metrics import record_cache_lookup
+
+# The application's jobs by name, as 'module:function' so they import lazily
+ANALYTICS_JOBS = {
+    'rankings': 'analytics.ranking:compute_rankings',
+    'author_impact': 'analytics.ranking:compute_author_impact',
+    'related': 'analytics.similarity:compute_related',
+    'communities': 'analytics.community:compute_communities',
+    'layout': 'analytics.layout:compute_layout'
+}
+
+class AnalyticsEngine:
+    def __init__(self, store, max_wait=2.0):
+        self.store = store
+        self.max_wait = max_wait
+        self.jobs = {}
+        self.results = {}
+        self._futures = {}
+        self._matrices = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='analytics')
+
+    def register(self, name, compute):
+        """Register `compute(matrices, previous_result) -> result` under `name`.
+
+        `compute` may be given as 'module:function' to import it on first run.
+        """
+        self.jobs[name] = compute
+
+    def _job(self, name):
+        compute = self.jobs[name]
+        if isinstance(compute, str):
+            module, function = compute.split(':')
+            compute = self.jobs[name] = getattr(importlib.import_module(module), function)
+        return compute
+
+    def _export(self):
+        """GraphMatrices for the current version, shared by all jobs of that version."""
+        from analytics.matrix import GraphMatrices
+        with self.store.read() as graph:
+            version = getattr(graph, 'version', None)
+            if version is None:
+                version = self.store.version
+            if self._matrices is None or self._matrices.version != version:
+                self._matrices = GraphMatrices.from_graph(graph, version)
+        return self._matrices
+
+    def _run(self, name, matrices=None):
+        if matrices is None:
+            matrices = self._export()
+        cached = self.results.get(name)
+        if cached is None or cached[0] != matrices.version:
+            previous = cached[1] if cached else None
+            self.results[name] = (matrices.version, self._job(name)(matrices, previous))
+        return self.results[name]
+
+    def compute_all(self):
+        """Bring every job to one version; returns (version, {name: result}).
+
+        Runs on the worker thread, so it never overlaps a scheduled job.
+        """
+        def run_all():
+            matrices = self._export()
+            return matrices.version, {name: self._run(name, matrices)[1] for name in self.jobs}
+        return self._executor.submit(run_all).result()
+
+    def schedule(self, name):
+        """Queue a recomputation of `name` unless one is already pending."""
+        with self._lock:
+            future = self._futures.get(name)
+            # A running job may have exported an older version; only a job that
+            # has not started yet is guaranteed to see the latest writes
+            if future is None or future.running() or future.done():
+                future = self._futures[name] = self._executor.submit(self._run, name)
+            return future
+
+    def schedule_all(self):
+        """Queue every job, e.g. right after a write, so results are ready early."""
+        for name in self.jobs:
+            self.schedule(name)
+
+    def get(self, name):
+        """Return (result, version, stale) for job `name`."""
+        version = self.store.version
+        cached = self.results.get(name)
+        if cached is not None and cached[0] == version:
+            record_cache_lookup('analytics', True)
+            return cached[1], cached[0], False
+
+        record_cache_lookup('analytics', False)
+        future = self.schedule(name)
+        # Without any previous result there is nothing to fall back on
+        done, _ = wait([future], timeout=None if cached is None else self.max_wait)
+        if done:
+            cached = future.result()
+        return cached[1], cached[0], cached[0] != self.store.version
@@ -0,0 +1,181 @@
+"""
+Server-side force-directed layout, cached per graph version.
+
+The layout follows Fruchterman-Reingold (edges attract with d^2/k, nodes repel
+with k^2/d) but is vectorized for large graphs:
+
+- edge attraction is accumulated with bincount over the edge arrays
+- repulsion uses a particle-mesh approximation: nodes are binned into a grid
+  and the repulsive field of the whole grid is one FFT convolution, so an
+  iteration costs O(nodes + edges + grid^2 log grid) instead of O(nodes^2)
+
+After a small write only the new nodes are placed: they start next to their
+already placed neighbours and move through the field of the existing layout,
+which stays fixed so clients can patch their view.
+"""
+
+import numpy as np
+import scipy.sparse as sp
+
+def _grid_size(n):
+    """Grid resolution for n nodes: finer grids only pay off for large graphs."""
+    return int(np.clip(np.sqrt(n), 16, 64))
+
+def _grid(positions, grid):
+    """Bounding-box origin, cell size and the grid cell of every position."""
+    origin = positions.min(axis=0)
+    span = max(float((positions.max(axis=0) - origin).max()), 1.0e-9)
+    cell = span * 1.0001 / grid
+    cells = np.minimum(((positions - origin) / cell).astype(np.int64), grid - 1)
+    return origin, cell, cells
+
+def repulsion_field(positions, k, grid=64):
+    """Repulsive force field of `positions` sampled on a grid.
+
+    Returns (field_x, field_y, origin, cell); the self-interaction of each
+    cell is left out.
+    """
+    origin, cell, cells = _grid(positions, grid)
+    density = np.zeros((grid, grid))
+    np.add.at(density, (cells[:, 0], cells[:, 1]), 1.0)
+
+    offsets = np.arange(-grid + 1, grid) * cell
+    dx, dy = np.meshgrid(offsets, offsets, indexing='ij')
+    r2 = dx ** 2 + dy ** 2
+    r2[grid - 1, grid - 1] = np.inf
+
+    shape = (3 * grid - 2, 3 * grid - 2)
+    density_fft = np.fft.rfft2(density, shape)
+    window = slice(grid - 1, 2 * grid - 1)
+    field_x = np.fft.irfft2(density_fft * np.fft.rfft2(k * k * dx / r2, shape), shape)[window, window]
+    field_y = np.fft.irfft2(density_fft * np.fft.rfft2(k * k * dy / r2, shape), shape)[window, window]
+    return field_x, field_y, origin, cell
+
+def _sample_field(field, positions):
+    field_x, field_y, origin, cell = field
+    grid = field_x.shape[0]
+    cells = np.clip(((positions - origin) / cell).astype(np.int64), 0, grid - 1)
+    return np.stack([field_x[cells[:, 0], cells[:, 1]], field_y[cells[:, 0], cells[:, 1]]], axis=1)
+
+def _local_repulsion(positions, k, grid):
+    """Push nodes that share a grid cell away from the cell centroid."""
+    _, cell, cells = _grid(positions, grid)
+    flat = cells[:, 0] * grid + cells[:, 1]
+    count = np.bincount(flat, minlength=grid * grid)
+    centroid = np.stack([np.bincount(flat, weights=positions[:, axis], minlength=grid * grid)
+                         for axis in (0, 1)], axis=1) / np.maximum(count, 1)[:, None]
+    offset = positions - centroid[flat]
+    dist2 = (offset ** 2).sum(axis=1) + (0.01 * cell) ** 2
+    return (count[flat] - 1)[:, None] * k * k * offset / dist2[:, None]
+
+def _attraction(positions, rows, cols, weights, k, n):
+    delta = positions[rows] - positions[cols]
+    dist = np.sqrt((delta ** 2).sum(axis=1))
+    pull = delta * (weights * dist / k)[:, None]
+    return np.stack([np.bincount(cols, weights=pull[:, axis], minlength=n) -
+                     np.bincount(rows, weights=pull[:, axis], minlength=n)
+                     for axis in (0, 1)], axis=1)
+
+def _limit(force, temperature):
+    length = np.sqrt((force ** 2).sum(axis=1)) + 1.0e-12
+    return force * (np.minimum(length, temperature) / length)[:, None]
+
+def force_layout(adjacency, positions=None, iterations=100, grid=None, gravity=0.05, seed=0):
+    """Positions (n x 2) for a symmetric weighted adjacency matrix."""
+    n = adjacency.shape[0]
+    grid = grid or _grid_size(n)
+    rng = np.random.default_rng(seed)
+    positions = rng.random((n, 2)) if positions is None else positions.copy()
+    if n < 2:
+        return positions
+
+    edges = sp.triu(adjacency, k=1).tocoo()
+    k = 1.0 / np.sqrt(n)
+    for iteration in range(iterations):
+        force = _sample_field(repulsion_field(positions, k, grid), positions)
+        force += _local_repulsion(positions, k, grid)
+        force += _attraction(positions, edges.row, edges.col, edges.data, k, n)
+        # Weak gravity keeps disconnected components from drifting away
+        force -= gravity * (positions - positions.mean(axis=0)) / k
+        temperature = 0.1 * (1.0 - iteration / iterations) + 1.0e-4
+        positions += _limit(force, temperature)
+    return positions
+
+def place_new_nodes(adjacency, positions, new, iterations=30, grid=None, gravity=0.05, seed=0):
+    """Place the `new` nodes into an existing layout without moving the others."""
+    n = adjacency.shape[0]
+    grid = grid or _grid_size(n)
+    rng = np.random.default_rng(seed)
+    positions = positions.copy()
+    placed = ~new
+    k = 1.0 / np.sqrt(n)
+
+    # Start at the centroid of placed neighbours, or anywhere in the layout
+    adjacency = adjacency.tocsr()
+    to_placed = adjacency[new][:, placed]
+    counts = np.asarray(to_placed.sum(axis=1)).ravel()
+    start = to_placed @ positions[placed] / np.maximum(counts, 1)[:, None]
+    origin, span = positions[placed].min(axis=0), np.ptp(positions[placed], axis=0)
+    lonely = counts == 0
+    start[lonely] = origin + rng.random((lonely.sum(), 2)) * span
+    positions[new] = start + rng.normal(scale=k, size=start.shape)
+
+    # The existing layout is fixed, so its field only has to be computed once
+    field = repulsion_field(positions[placed], k, grid)
+    center = positions[placed].mean(axis=0)
+    new_index = np.flatnonzero(new)
+    edges = adjacency[new].tocoo()
+    for iteration in range(iterations):
+        moving = positions[new_index]
+        force = _sample_field(field, moving)
+        delta = moving[edges.row] - positions[edges.col]
+        dist = np.sqrt((delta ** 2).sum(axis=1))
+        pull = delta * (edges.data * dist / k)[:, None]
+        force -= np.stack([np.bincount(edges.row, weights=pull[:, axis], minlength=len(new_index))
+                           for axis in (0, 1)], axis=1)
+        force -= gravity * (moving - center) / k
+        temperature = k * (1.0 - iteration / iterations) + 1.0e-4
+        positions[new_index] += _limit(force, temperature)
+    return positions
+
+def symmetric_adjacency(rows, cols, n, weights=None):
+    """Undirected adjacency with parallel edges summed and no self-loops."""
+    weights = np.ones(len(rows)) if weights is None else weights
+    adjacency = sp.csr_matrix((weights, (rows, cols)), shape=(n, n))
+    adjacency = adjacency + adjacency.T
+    adjacency = (adjacency - sp.diags(adjacency.diagonal())).tocsr()
+    adjacency.eliminate_zeros()
+    return adjacency
+
+def compute_layout(matrices, previous=None, relayout_fraction=0.2):
+    """Analytics job: a position for every node.
+
+    Reuses the previous layout when fewer than `relayout_fraction` of the
+    nodes are new; otherwise lays out the whole graph again. 'generation' is
+    the graph version of the last full layout, so clients holding positions
+    from another generation know to reload rather than patch.
+    """
+    n = matrices.num_nodes
+    adjacency = symmetric_adjacency(matrices.src, matrices.dst, n)
+    node_ids = matrices.node_ids
+
+    positions = None
+    generation = matrices.version
+    if previous is not None and n:
+        old = previous['index']
+        known = np.array([node in old for node in node_ids], dtype=bool)
+        if known.any() and (~known).sum() <= relayout_fraction * n:
+            positions = np.zeros((n, 2))
+            positions[known] = previous['positions'][[old[node] for node in node_ids if node in old]]
+            if not known.all():
+                positions = place_new_nodes(adjacency, positions, ~known)
+            generation = previous['generation']
+
+    if positions is None:
+        positions = force_layout(adjacency)
+
+    return {
+        'positions': positions,
+        'index': {node: i for i, node in enumerate(node_ids)},
+        'generation': generation
+    }
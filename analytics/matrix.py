@@ -0,0 +1,122 @@
+"""
+Export of the knowledge graph into sparse matrices.
+
+Graph algorithms run on scipy.sparse matrices rather than NetworkX objects.
+GraphMatrices captures the node ids, node types and typed edge list of one
+graph version; the per-relation matrices are built lazily from it.
+"""
+
+from functools import cached_property
+
+import numpy as np
+import scipy.sparse as sp
+
+def _codes(names):
+    return {name: code for code, name in enumerate(names)}
+
+class GraphMatrices:
+    def __init__(self, version, node_ids, node_types, node_type_names, src, dst, edge_types, edge_type_names):
+        self.version = version
+        self.node_ids = node_ids
+        self.node_types = node_types
+        self.node_type_names = list(node_type_names)
+        self.src = src
+        self.dst = dst
+        self.edge_types = edge_types
+        self.edge_type_names = list(edge_type_names)
+
+    @classmethod
+    def from_graph(cls, graph, version):
+        """Export a NetworkX graph or a SharedGraphView."""
+        if hasattr(graph, 'array'):
+            # Shared snapshots already hold CSR arrays; no per-edge Python work
+            indptr = graph.array('out_indptr')
+            return cls(version,
+                       graph.node_ids(),
+                       np.asarray(graph.array('node_types'), dtype=np.int64),
+                       graph.node_type_names,
+                       np.repeat(np.arange(len(graph)), np.diff(indptr)),
+                       np.asarray(graph.array('out_indices'), dtype=np.int64),
+                       np.asarray(graph.array('out_types'), dtype=np.int64),
+                       graph.edge_type_names)
+
+        node_type_codes = {}
+        node_ids = []
+        node_types = []
+        for node, node_type in graph.nodes(data='type', default='unknown'):
+            node_ids.append(node)
+            node_types.append(node_type_codes.setdefault(node_type, len(node_type_codes)))
+
+        index = {node: i for i, node in enumerate(node_ids)}
+        edge_type_codes = {}
+        src, dst, edge_types = [], [], []
+        for u, v, edge_type in graph.edges(data='type', default='unknown'):
+            src.append(index[u])
+            dst.append(index[v])
+            edge_types.append(edge_type_codes.setdefault(edge_type, len(edge_type_codes)))
+
+        return cls(version,
+                   node_ids,
+                   np.array(node_types, dtype=np.int64),
+                   node_type_codes,
+                   np.array(src, dtype=np.int64),
+                   np.array(dst, dtype=np.int64),
+                   np.array(edge_types, dtype=np.int64),
+                   edge_type_codes)
+
+    @property
+    def num_nodes(self):
+        return len(self.node_ids)
+
+    def nodes_of_type(self, node_type):
+        """Graph indices of all nodes with the given type."""
+        code = _codes(self.node_type_names).get(node_type)
+        if code is None:
+            return np.zeros(0, dtype=np.int64)
+        return np.flatnonzero(self.node_types == code)
+
+    def edges_of_type(self, edge_type):
+        """(src, dst) graph indices of all edges with the given type."""
+        code = _codes(self.edge_type_names).get(edge_type)
+        if code is None:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+        mask = self.edge_types == code
+        return self.src[mask], self.dst[mask]
+
+    def relation_matrix(self, edge_type, row_type, col_type):
+        """Binary CSR matrix of `edge_type` edges between two node types.
+
+        Returns (matrix, row_nodes, col_nodes), where row_nodes/col_nodes map
+        matrix positions back to graph indices. Parallel edges collapse to 1.
+        """
+        rows = self.nodes_of_type(row_type)
+        cols = rows if col_type == row_type else self.nodes_of_type(col_type)
+        row_pos = np.full(self.num_nodes, -1, dtype=np.int64)
+        row_pos[rows] = np.arange(len(rows))
+        col_pos = row_pos if cols is rows else np.full(self.num_nodes, -1, dtype=np.int64)
+        col_pos[cols] = np.arange(len(cols))
+
+        src, dst = self.edges_of_type(edge_type)
+        src, dst = row_pos[src], col_pos[dst]
+        keep = (src >= 0) & (dst >= 0)
+        matrix = sp.csr_matrix((np.ones(keep.sum()), (src[keep], dst[keep])),
+                               shape=(len(rows), len(cols)))
+        matrix.sum_duplicates()
+        matrix.data[:] = 1.0
+        return matrix, rows, cols
+
+    @cached_property
+    def citations(self):
+        """Paper-by-paper matrix C with C[i, j] = 1 when paper i cites paper j."""
+        matrix, papers, _ = self.relation_matrix('cites', 'paper', 'paper')
+        # Self-citations do not count towards influence
+        matrix = (matrix - sp.diags(matrix.diagonal())).tocsr()
+        matrix.eliminate_zeros()
+        return matrix, papers
+
+    @cached_property
+    def authorship(self):
+        """Author-by-paper matrix W with W[a, p] = 1 when author a wrote paper p."""
+        matrix, authors, papers = self.relation_matrix('wrote', 'author', 'paper')
+        return matrix, authors, papers
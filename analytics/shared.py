@@ -0,0 +1,182 @@
+"""
+Graph analytics shared between worker processes.
+
+In multi-process mode (``GRAPH_SHARED_DIR`` set) the GraphWriter runs the
+analytics jobs once per published version and stores the results next to the
+snapshot. Workers answer from the newest results instead of running the jobs
+themselves, so the cost does not grow with the number of workers, and warm
+started results such as community ids and layout generations are the same in
+every worker.
+
+A results file holds a pickle whose numpy buffers are stored out-of-band
+after it. Workers map the file, and the arrays point into the mapping, so the
+page cache holds one copy however many workers load it.
+"""
+
+import json
+import mmap
+import os
+import pickle
+import struct
+import threading
+import time
+
+from analytics.engine import ANALYTICS_JOBS, AnalyticsEngine
+from graph.shared import SOCKET_FILE, SharedGraphStore
+from monitoring.metrics import record_cache_lookup
+
+MAGIC = b'KGANLY01'
+ANALYTICS_FILE = 'ANALYTICS'
+
+def analytics_filename(version):
+    return f"analytics-v{version:010d}.bin"
+
+def _aligned(offset, alignment=64):
+    return (offset + alignment - 1) // alignment * alignment
+
+def write_analytics(path, version, results):
+    """Write the results of `version` to `path`."""
+    buffers = []
+    payload = pickle.dumps(results, protocol=5, buffer_callback=buffers.append)
+    buffers = [buffer.raw() for buffer in buffers]
+    sections = []
+    offset = _aligned(len(payload))
+    for buffer in buffers:
+        sections.append((offset, buffer.nbytes))
+        offset = _aligned(offset + buffer.nbytes)
+    header = json.dumps({'version': version, 'pickle': len(payload), 'buffers': sections}).encode('utf-8')
+
+    with open(path, 'wb') as f:
+        f.write(MAGIC + struct.pack('<Q', len(header)) + header)
+        data_start = _aligned(f.tell())
+        f.seek(data_start)
+        f.write(payload)
+        for (offset, _), buffer in zip(sections, buffers):
+            f.seek(data_start + offset)
+            f.write(buffer)
+
+def read_analytics(path):
+    """(version, results) from a file written by write_analytics(); arrays are read-only."""
+    with open(path, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if mm[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not an analytics file")
+    (header_length,) = struct.unpack_from('<Q', mm, len(MAGIC))
+    header_start = len(MAGIC) + 8
+    header = json.loads(mm[header_start:header_start + header_length])
+    data_start = _aligned(header_start + header_length)
+
+    view = memoryview(mm)
+    buffers = [view[data_start + offset:data_start + offset + length]
+               for offset, length in header['buffers']]
+    results = pickle.loads(view[data_start:data_start + header['pickle']], buffers=buffers)
+    return header['version'], results
+
+class AnalyticsPublisher:
+    """Runs the analytics jobs inside the GraphWriter and publishes their results.
+
+    The GraphWriter calls notify() after each published version; run() then
+    computes the newest version, so a burst of writes costs one computation.
+    """
+    def __init__(self, directory, keep_versions=3, jobs=ANALYTICS_JOBS):
+        self.directory = directory
+        self.keep_versions = keep_versions
+        self.version = None
+        self.engine = AnalyticsEngine(SharedGraphStore(directory))
+        for name, compute in jobs.items():
+            self.engine.register(name, compute)
+        self._changed = threading.Event()
+
+    def notify(self):
+        """Signal that a new graph version was published."""
+        self._changed.set()
+
+    def publish(self):
+        """Compute the current version's results and publish them; returns the version."""
+        version, results = self.engine.compute_all()
+        if version == self.version:
+            return version
+        filename = analytics_filename(version)
+        path = os.path.join(self.directory, filename)
+        write_analytics(path + '.tmp', version, results)
+        os.replace(path + '.tmp', path)
+
+        # Workers follow the pointer, as they follow CURRENT to the snapshot
+        pointer = os.path.join(self.directory, ANALYTICS_FILE)
+        with open(pointer + '.tmp', 'w') as f:
+            f.write(filename)
+        os.replace(pointer + '.tmp', pointer)
+        self.version = version
+
+        published = sorted(name for name in os.listdir(self.directory)
+                           if name.startswith('analytics-v') and name.endswith('.bin'))
+        for name in published[:-self.keep_versions]:
+            # Workers still mapping an unlinked file keep reading it safely
+            os.remove(os.path.join(self.directory, name))
+        return version
+
+    def run(self):
+        """Publish after every notify(); runs for the lifetime of the writer."""
+        while True:
+            self._changed.wait()
+            self._changed.clear()
+            try:
+                self.publish()
+            except Exception as e:
+                # Keep publishing later versions; requests serve the last results meanwhile
+                print(f"Analytics for {self.directory} failed: {e}")
+
+class SharedAnalytics:
+    """AnalyticsEngine counterpart for workers of a SharedGraphStore.
+
+    get() answers from the results the GraphWriter published; no job runs in
+    the worker.
+    """
+    def __init__(self, store, max_wait=2.0, poll_interval=0.05):
+        self.store = store
+        self.max_wait = max_wait
+        self.poll_interval = poll_interval
+        self._loaded = None
+        self._load_lock = threading.Lock()
+
+    def schedule_all(self):
+        """Nothing to schedule: the writer computes every version it publishes."""
+
+    def _latest(self):
+        """(version, results) most recently published, loading them only when the pointer changed."""
+        path = os.path.join(self.store.directory, ANALYTICS_FILE)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        stamp = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        loaded = self._loaded
+        if loaded is not None and loaded[0] == stamp:
+            return loaded[1:]
+        with self._load_lock:
+            if self._loaded is None or self._loaded[0] != stamp:
+                with open(path) as f:
+                    filename = f.read().strip()
+                self._loaded = (stamp,) + read_analytics(os.path.join(self.store.directory, filename))
+            return self._loaded[1:]
+
+    def get(self, name):
+        """Return (result, version, stale) for job `name`, as AnalyticsEngine.get() does."""
+        version = self.store.version
+        published = self._latest()
+        if published is not None and published[0] == version:
+            record_cache_lookup('analytics', True)
+            return published[1][name], version, False
+
+        record_cache_lookup('analytics', False)
+        # Results follow each version shortly; wait up to max_wait for them, or
+        # for as long as the writer runs when nothing was published yet
+        deadline = time.monotonic() + self.max_wait
+        while published is None or (published[0] < version and time.monotonic() < deadline):
+            if published is None and not os.path.exists(os.path.join(self.store.directory, SOCKET_FILE)):
+                raise RuntimeError(f"No analytics published in {self.store.directory}; start the writer with: "
+                                   f"python -m graph.shared --dir {self.store.directory} --serve")
+            time.sleep(self.poll_interval)
+            published = self._latest()
+        published_version, results = published
+        return results[name], published_version, published_version != self.store.version
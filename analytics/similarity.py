@@ -0,0 +1,135 @@
+"""
+Related-paper scores from bibliographic coupling and co-citation.
+
+With the citation matrix C (C[i, j] = 1 when paper i cites paper j):
+
+- bibliographic coupling C @ C.T counts the references two papers share
+- co-citation C.T @ C counts the papers that cite both
+
+A reference cited by h papers links all h of them, and a paper with h
+references makes all of them co-cited, so one such hub alone puts h * h
+entries into the product. As in the inverse document frequency weighting of
+text retrieval, sharing something almost everybody shares says little about
+relatedness: links through hubs with more than `max_link_degree` papers are
+ignored, which bounds every row of the product.
+
+The product is computed for blocks of rows whose estimated number of entries
+stays under `max_block_entries`, and only the top-k entries of every row are
+kept. The result takes O(papers * k) memory; the working set is bounded by
+the block size.
+"""
+
+import numpy as np
+import scipy.sparse as sp
+
+def top_k_per_row(matrix, k):
+    """Keep the k largest entries of every row of a CSR matrix.
+
+    Returns (rows, cols, values) sorted by row, then by value descending.
+    Ties go to the lower column index.
+    """
+    lengths = np.diff(matrix.indptr)
+    keep = np.ones(matrix.nnz, dtype=bool)
+    for row in np.flatnonzero(lengths > k).tolist():
+        start, stop = matrix.indptr[row], matrix.indptr[row + 1]
+        values = matrix.data[start:stop]
+        threshold = np.partition(values, len(values) - k)[len(values) - k]
+        row_keep = values > threshold
+        # Fill the remaining slots with the lowest columns scoring exactly the threshold
+        ties = np.flatnonzero(values == threshold)
+        needed = k - row_keep.sum()
+        if needed < len(ties):
+            ties = ties[np.argpartition(matrix.indices[start:stop][ties], needed - 1)[:needed]]
+        row_keep[ties] = True
+        keep[start:stop] = row_keep
+
+    rows = np.repeat(np.arange(matrix.shape[0]), lengths)[keep]
+    cols, values = matrix.indices[keep].astype(np.int64), matrix.data[keep]
+    order = np.lexsort((cols, -values, rows))
+    return rows[order], cols[order], values[order]
+
+def _link_matrix(citations, max_link_degree):
+    """[C, C.T] without the columns of hubs linking more than max_link_degree papers."""
+    links = sp.hstack([citations, citations.T], format='csr')
+    if max_link_degree is not None:
+        degree = np.bincount(links.indices, minlength=links.shape[1])
+        links.data[degree[links.indices] > max_link_degree] = 0
+        links.eliminate_zeros()
+    return links
+
+def _row_blocks(links, max_block_entries, block_size):
+    """Row ranges whose products have at most about max_block_entries entries."""
+    # Each link of a row adds one entry per paper sharing it (an upper bound)
+    degree = np.bincount(links.indices, minlength=links.shape[1])
+    total = np.cumsum(links @ degree)
+    start, n = 0, links.shape[0]
+    while start < n:
+        limit = (total[start - 1] if start else 0) + max_block_entries
+        stop = min(max(int(np.searchsorted(total, limit, side='right')), start + 1), start + block_size, n)
+        yield start, stop
+        start = stop
+
+def related_papers(citations, top_k=20, block_size=2048, max_link_degree=1000, max_block_entries=4000000):
+    """Top-k related papers for every paper.
+
+    The score of a pair is its number of shared references plus the number of
+    papers citing both, not counting hubs linking more than `max_link_degree`
+    papers. Returns CSR-style arrays 'indptr', 'indices' and 'scores', with
+    each row ordered best first.
+    """
+    n = citations.shape[0]
+    # [C, C.T] @ [C, C.T].T = C @ C.T + C.T @ C in a single product
+    links = _link_matrix(citations, max_link_degree)
+    links_t = links.T.tocsr()
+
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    indices, scores = [], []
+    for start, stop in _row_blocks(links, max_block_entries, block_size):
+        block = links[start:stop] @ links_t
+        # A paper is not related to itself
+        block_rows = np.repeat(np.arange(start, stop), np.diff(block.indptr))
+        block.data[block.indices == block_rows] = 0
+        block.eliminate_zeros()
+
+        rows, cols, values = top_k_per_row(block, top_k)
+        indptr[start + 1:stop + 1] = indptr[start] + np.cumsum(np.bincount(rows, minlength=stop - start))
+        indices.append(cols)
+        scores.append(values)
+
+    return {
+        'indptr': indptr,
+        'indices': np.concatenate(indices) if indices else np.zeros(0, dtype=np.int64),
+        'scores': np.concatenate(scores) if scores else np.zeros(0),
+        'links': links
+    }
+
+def compute_related(matrices, previous=None, top_k=20, max_link_degree=1000):
+    """Analytics job: top-k related papers for every paper."""
+    citations, papers = matrices.citations
+    paper_ids = [matrices.node_ids[i] for i in papers]
+    result = related_papers(citations, top_k=top_k, max_link_degree=max_link_degree)
+    result['papers'] = paper_ids
+    result['index'] = {paper: i for i, paper in enumerate(paper_ids)}
+    # Split scores with the same hub-free links they were computed from
+    links = result.pop('links')
+    result['citations'] = links[:, :len(paper_ids)].tocsr()
+    result['cited_by'] = links[:, len(paper_ids):].tocsr()
+    return result
+
+def lookup_related(related, paper, limit):
+    """(paper, score, shared_references, co_cited_by) tuples for one paper, best first."""
+    i = related['index'].get(paper)
+    if i is None:
+        return []
+    start = related['indptr'][i]
+    stop = min(related['indptr'][i + 1], start + limit)
+    neighbours = related['indices'][start:stop]
+
+    # Split the score into its two parts for just the returned papers
+    citations, cited_by = related['citations'], related['cited_by']
+    coupling = (citations[neighbours] @ citations[i].T).toarray().ravel()
+    cocitation = (cited_by[neighbours] @ cited_by[i].T).toarray().ravel()
+    return [(related['papers'][j], score, int(shared), int(co_cited))
+            for j, score, shared, co_cited in zip(neighbours.tolist(),
+                                                  related['scores'][start:stop].tolist(),
+                                                  coupling.tolist(), cocitation.tolist())]
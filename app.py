@@ -1,98 +1,103 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for
+from flask import Blueprint, Flask, Response, render_template, request, jsonify
 import networkx as nx
 import json
-import csv
 import io
-from datetime import datetime
-import pandas as pd
+import tempfile
 from werkzeug.utils import secure_filename
 import os
+from collections import Counter
+from monitoring.metrics import GRAPH_NODES, GRAPH_EDGES, instrument_app
+from monitoring.profiling import enable_profiling
+from graph.store import GraphStore
+from graph.ingest import (normalize_paper, iter_csv_text, iter_json_papers, iter_ndjson_papers,
+                          changed_papers, add_paper_to_graph)
+from graph.export import EXPORT_FORMATS, export_source
+from graph.parallel import parse_file
+from analytics.engine import ANALYTICS_JOBS, AnalyticsEngine
 
-app = Flask(__name__)
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+# Routes are registered on a blueprint so create_app() can build the Flask app
+routes = Blueprint('knowledge_graph', __name__)
 
-# Initialize the knowledge graph
+# Initialize the knowledge graph; all access goes through the store's lock
 knowledge_graph = nx.MultiDiGraph()
+if os.getenv('GRAPH_SHARED_DIR'):
+    # Multi-process mode: workers map published snapshots and send writes to the writer process
+    from graph.shared import SharedGraphStore
+    graph_store = SharedGraphStore(os.getenv('GRAPH_SHARED_DIR'))
+else:
+    graph_store = GraphStore(knowledge_graph,
+                             ingest_batch_size=int(os.getenv('INGEST_BATCH_SIZE', 500)),
+                             change_log_size=int(os.getenv('CHANGE_LOG_SIZE', 100000)))
+
+# Graph analytics computed in the background and cached per graph version; the
+# jobs (and with them numpy and scipy) are imported when they first run
+if os.getenv('GRAPH_SHARED_DIR'):
+    # The writer process computes them once per version for all workers
+    from analytics.shared import SharedAnalytics
+    analytics = SharedAnalytics(graph_store, max_wait=float(os.getenv('ANALYTICS_MAX_WAIT', 2.0)))
+else:
+    analytics = AnalyticsEngine(graph_store, max_wait=float(os.getenv('ANALYTICS_MAX_WAIT', 2.0)))
+    for name, compute in ANALYTICS_JOBS.items():
+        analytics.register(name, compute)
 
 # Store additional metadata
 paper_metadata = {}
 author_metadata = {}
 journal_metadata = {}
 
-@app.route('/')
+def count_nodes_by_type():
+    """Node counts by type for the /metrics gauges; the store keeps them, no graph scan."""
+    node_counts, _ = graph_store.type_counts()
+    return {(node_type,): count for node_type, count in node_counts.items()}
+
+def count_edges_by_type():
+    """Edge counts by type for the /metrics gauges; the store keeps them, no graph scan."""
+    _, edge_counts = graph_store.type_counts()
+    return {(edge_type,): count for edge_type, count in edge_counts.items()}
+
+GRAPH_NODES.set_function(count_nodes_by_type)
+GRAPH_EDGES.set_function(count_edges_by_type)
+
+@routes.route('/')
 def index():
     """Main page with the knowledge graph interface."""
     return render_template('index.html')
 
-@app.route('/api/papers', methods=['GET'])
+@routes.route('/api/papers', methods=['GET'])
 def get_papers():
     """Get all papers in the knowledge graph."""
     papers = []
-    for node in knowledge_graph.nodes():
-        if knowledge_graph.nodes[node].get('type') == 'paper':
-            papers.append({
-                'id': node,
-                'title': knowledge_graph.nodes[node].get('title', node),
-                'year': knowledge_graph.nodes[node].get('year', ''),
-                'authors': knowledge_graph.nodes[node].get('authors', []),
-                'journal': knowledge_graph.nodes[node].get('journal', '')
-            })
+    with graph_store.read() as graph:
+        for node, node_data in graph.nodes(data=True):
+            if node_data.get('type') == 'paper':
+                papers.append({
+                    'id': node,
+                    'title': node_data.get('title', node),
+                    'year': node_data.get('year', ''),
+                    'authors': node_data.get('authors', []),
+                    'journal': node_data.get('journal', '')
+                })
     return jsonify(papers)
 
-@app.route('/api/papers', methods=['POST'])
+@routes.route('/api/papers', methods=['POST'])
 def add_paper():
     """Add a new paper to the knowledge graph."""
     try:
         data = request.get_json()
         
-        paper_id = data.get('title', '').strip()
-        if not paper_id:
+        paper = normalize_paper(data or {})
+        if paper is None:
             return jsonify({'error': 'Paper title is required'}), 400
         
-        # Add paper node
-        knowledge_graph.add_node(paper_id, 
-                                type='paper',
-                                title=paper_id,
-                                year=data.get('year', ''),
-                                authors=data.get('authors', []),
-                                journal=data.get('journal', ''))
-        
-        # Add author nodes and relationships
-        authors = data.get('authors', [])
-        if isinstance(authors, str):
-            authors = [a.strip() for a in authors.split(',')]
+        added, _ = upsert_papers([paper])
+        message = 'Paper added successfully' if added else 'Paper unchanged'
         
-        for author in authors:
-            if author.strip():
-                author = author.strip()
-                knowledge_graph.add_node(author, type='author', name=author)
-                knowledge_graph.add_edge(author, paper_id, type='wrote')
-        
-        # Add journal node and relationship
-        journal = data.get('journal', '').strip()
-        if journal:
-            knowledge_graph.add_node(journal, type='journal', name=journal)
-            knowledge_graph.add_edge(paper_id, journal, type='published_in')
-        
-        # Add citation relationships
-        cited_papers = data.get('cited_papers', [])
-        if isinstance(cited_papers, str):
-            cited_papers = [c.strip() for c in cited_papers.split(',')]
-        
-        for cited_paper in cited_papers:
-            if cited_paper.strip():
-                cited_paper = cited_paper.strip()
-                # Add cited paper as node if it doesn't exist
-                if not knowledge_graph.has_node(cited_paper):
-                    knowledge_graph.add_node(cited_paper, type='paper', title=cited_paper)
-                knowledge_graph.add_edge(paper_id, cited_paper, type='cites')
-        
-        return jsonify({'success': True, 'message': 'Paper added successfully'})
+        return jsonify({'success': True, 'message': message})
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/upload', methods=['POST'])
+@routes.route('/api/upload', methods=['POST'])
 def upload_file():
     """Upload and process CSV/JSON files."""
     try:
@@ -110,69 +115,51 @@ def upload_file():
             return process_csv_file(file)
         elif file_extension == 'json':
             return process_json_file(file)
+        elif file_extension in ('ndjson', 'jsonl'):
+            return process_ndjson_file(file)
         else:
-            return jsonify({'error': 'Unsupported file format. Please upload CSV or JSON files.'}), 400
+            return jsonify({'error': 'Unsupported file format. Please upload CSV, JSON or NDJSON files.'}), 400
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def upsert_papers(papers):
+    """Write the papers that differ from the graph; returns (added, unchanged) counts."""
+    # Unchanged records are filtered under the read lock, so a repeated
+    # upload neither takes the write lock nor bumps the graph version
+    with graph_store.read() as graph:
+        changed = changed_papers(graph, papers)
+    added = sum(graph_store.apply(changed, add_paper_to_graph))
+    if added:
+        analytics.schedule_all()
+    return added, len(papers) - added
+
+def parse_upload_in_parallel(file, file_format):
+    """Papers of a large upload parsed by the ingest process pool, or None to parse serially."""
+    workers = int(os.getenv('INGEST_WORKERS', 0))
+    min_bytes = int(os.getenv('PARALLEL_INGEST_MIN_BYTES', 4 * 1024 * 1024))
+    if workers < 2 or (request.content_length or 0) < min_bytes:
+        return None
+    # Workers read their byte ranges from a file instead of receiving copies
+    with tempfile.NamedTemporaryFile(suffix=f'.{file_format}') as upload:
+        file.save(upload)
+        upload.flush()
+        return parse_file(upload.name, file_format, workers=workers)
+
 def process_csv_file(file):
     """Process uploaded CSV file."""
     try:
-        # Read CSV file
-        stream = io.StringIO(file.stream.read().decode("UTF8"), newline=None)
-        csv_input = csv.DictReader(stream)
+        # Parse and normalize outside the write lock
+        papers = parse_upload_in_parallel(file, 'csv')
+        if papers is None:
+            papers = list(iter_csv_text(file.stream.read().decode("UTF8")))
         
-        papers_added = 0
-        for row in csv_input:
-            # Expected CSV columns: title, authors, journal, year, cited_papers
-            paper_data = {
-                'title': row.get('title', '').strip(),
-                'authors': row.get('authors', '').strip(),
-                'journal': row.get('journal', '').strip(),
-                'year': row.get('year', '').strip(),
-                'cited_papers': row.get('cited_papers', '').strip()
-            }
-            
-            if paper_data['title']:
-                # Process the paper data similar to add_paper endpoint
-                paper_id = paper_data['title']
-                
-                knowledge_graph.add_node(paper_id,
-                                        type='paper',
-                                        title=paper_id,
-                                        year=paper_data['year'],
-                                        authors=paper_data['authors'].split(',') if paper_data['authors'] else [],
-                                        journal=paper_data['journal'])
-                
-                # Add authors
-                if paper_data['authors']:
-                    authors = [a.strip() for a in paper_data['authors'].split(',')]
-                    for author in authors:
-                        if author:
-                            knowledge_graph.add_node(author, type='author', name=author)
-                            knowledge_graph.add_edge(author, paper_id, type='wrote')
-                
-                # Add journal
-                if paper_data['journal']:
-                    journal = paper_data['journal']
-                    knowledge_graph.add_node(journal, type='journal', name=journal)
-                    knowledge_graph.add_edge(paper_id, journal, type='published_in')
-                
-                # Add citations
-                if paper_data['cited_papers']:
-                    cited_papers = [c.strip() for c in paper_data['cited_papers'].split(',')]
-                    for cited_paper in cited_papers:
-                        if cited_paper:
-                            if not knowledge_graph.has_node(cited_paper):
-                                knowledge_graph.add_node(cited_paper, type='paper', title=cited_paper)
-                            knowledge_graph.add_edge(paper_id, cited_paper, type='cites')
-                
-                papers_added += 1
+        papers_added, papers_unchanged = upsert_papers(papers)
         
         return jsonify({
             'success': True,
-            'message': f'Successfully processed CSV file. Added {papers_added} papers.'
+            'message': f'Successfully processed CSV file. Added {papers_added} papers.' +
+                       (f' Skipped {papers_unchanged} unchanged papers.' if papers_unchanged else '')
         })
     
     except Exception as e:
@@ -181,75 +168,71 @@ def process_csv_file(file):
 def process_json_file(file):
     """Process uploaded JSON file."""
     try:
-        data = json.load(file)
+        # Parse and normalize outside the write lock
+        papers = list(iter_json_papers(json.load(file)))
         
-        papers_added = 0
-        if isinstance(data, list):
-            for paper_data in data:
-                if paper_data.get('title'):
-                    # Process each paper similar to add_paper endpoint
-                    paper_id = paper_data['title']
-                    
-                    knowledge_graph.add_node(paper_id,
-                                            type='paper',
-                                            title=paper_id,
-                                            year=paper_data.get('year', ''),
-                                            authors=paper_data.get('authors', []),
-                                            journal=paper_data.get('journal', ''))
-                    
-                    # Add authors
-                    authors = paper_data.get('authors', [])
-                    if isinstance(authors, str):
-                        authors = [a.strip() for a in authors.split(',')]
-                    
-                    for author in authors:
-                        if author.strip():
-                            author = author.strip()
-                            knowledge_graph.add_node(author, type='author', name=author)
-                            knowledge_graph.add_edge(author, paper_id, type='wrote')
-                    
-                    # Add journal
-                    journal = paper_data.get('journal', '').strip()
-                    if journal:
-                        knowledge_graph.add_node(journal, type='journal', name=journal)
-                        knowledge_graph.add_edge(paper_id, journal, type='published_in')
-                    
-                    # Add citations
-                    cited_papers = paper_data.get('cited_papers', [])
-                    if isinstance(cited_papers, str):
-                        cited_papers = [c.strip() for c in cited_papers.split(',')]
-                    
-                    for cited_paper in cited_papers:
-                        if cited_paper.strip():
-                            cited_paper = cited_paper.strip()
-                            if not knowledge_graph.has_node(cited_paper):
-                                knowledge_graph.add_node(cited_paper, type='paper', title=cited_paper)
-                            knowledge_graph.add_edge(paper_id, cited_paper, type='cites')
-                    
-                    papers_added += 1
+        papers_added, papers_unchanged = upsert_papers(papers)
         
         return jsonify({
             'success': True,
-            'message': f'Successfully processed JSON file. Added {papers_added} papers.'
+            'message': f'Successfully processed JSON file. Added {papers_added} papers.' +
+                       (f' Skipped {papers_unchanged} unchanged papers.' if papers_unchanged else '')
         })
     
     except Exception as e:
         return jsonify({'error': f'Error processing JSON file: {str(e)}'}), 500
 
-@app.route('/api/query/author/<author_name>')
+def process_ndjson_file(file):
+    """Process uploaded newline-delimited JSON file."""
+    try:
+        # Parse and normalize outside the write lock
+        papers = parse_upload_in_parallel(file, 'ndjson')
+        if papers is None:
+            stream = io.TextIOWrapper(file.stream, encoding='utf-8')
+            papers = list(iter_ndjson_papers(stream))
+        
+        papers_added, papers_unchanged = upsert_papers(papers)
+        
+        return jsonify({
+            'success': True,
+            'message': f'Successfully processed NDJSON file. Added {papers_added} papers.' +
+                       (f' Skipped {papers_unchanged} unchanged papers.' if papers_unchanged else '')
+        })
+    
+    except Exception as e:
+        return jsonify({'error': f'Error processing NDJSON file: {str(e)}'}), 500
+
+@routes.route('/api/export/<export_format>')
+def export_graph(export_format):
+    """Stream the graph as CSV, NDJSON or GraphML."""
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f"Unknown format. Use one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    
+    iter_export, mimetype = EXPORT_FORMATS[export_format]
+    chunk_size = int(os.getenv('EXPORT_CHUNK_SIZE', 1000))
+    read, version = export_source(graph_store)
+    headers = {'Content-Disposition': f'attachment; filename=knowledge_graph.{export_format}'}
+    # Only a shared-mode export is a single version; locked-mode chunks read the live graph
+    if version is not None:
+        headers['X-Graph-Version'] = str(version)
+    return Response(iter_export(read, chunk_size=chunk_size), mimetype=mimetype, headers=headers)
+
+@routes.route('/api/query/author/<author_name>')
 def query_papers_by_author(author_name):
     """Query all papers written by a specific author."""
     try:
         papers = []
-        if knowledge_graph.has_node(author_name):
-            # Find all papers this author wrote
-            for neighbor in knowledge_graph.neighbors(author_name):
-                edge_data = knowledge_graph.get_edge_data(author_name, neighbor)
-                if any(edge.get('type') == 'wrote' for edge in edge_data.values()):
-                    paper_node = knowledge_graph.nodes[neighbor]
+        with graph_store.read() as graph:
+            if graph.has_node(author_name):
+                # Find all papers this author wrote
+                written = dict.fromkeys(paper for _, paper, edge_type
+                                        in graph.out_edges(author_name, data='type')
+                                        if edge_type == 'wrote')
+                for paper in written:
+                    paper_node = graph.nodes[paper]
                     if paper_node.get('type') == 'paper':
                         papers.append({
-                            'title': neighbor,
+                            'title': paper,
                             'year': paper_node.get('year', ''),
                             'journal': paper_node.get('journal', ''),
                             'authors': paper_node.get('authors', [])
@@ -264,27 +247,24 @@ def query_papers_by_author(author_name):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/query/citations/<paper_title>')
+@routes.route('/api/query/citations/<paper_title>')
 def query_citations(paper_title):
     """Find papers that cite a particular paper."""
     try:
         citing_papers = []
         cited_by_papers = []
         
-        if knowledge_graph.has_node(paper_title):
-            # Find papers that this paper cites
-            for neighbor in knowledge_graph.neighbors(paper_title):
-                edge_data = knowledge_graph.get_edge_data(paper_title, neighbor)
-                if any(edge.get('type') == 'cites' for edge in edge_data.values()):
-                    citing_papers.append(neighbor)
-            
-            # Find papers that cite this paper
-            for node in knowledge_graph.nodes():
-                if node != paper_title:
-                    if knowledge_graph.has_edge(node, paper_title):
-                        edge_data = knowledge_graph.get_edge_data(node, paper_title)
-                        if any(edge.get('type') == 'cites' for edge in edge_data.values()):
-                            cited_by_papers.append(node)
+        with graph_store.read() as graph:
+            if graph.has_node(paper_title):
+                # Find papers that this paper cites
+                citing_papers = list(dict.fromkeys(
+                    cited for _, cited, edge_type in graph.out_edges(paper_title, data='type')
+                    if edge_type == 'cites'))
+                
+                # Find papers that cite this paper
+                cited_by_papers = list(dict.fromkeys(
+                    citing for citing, _, edge_type in graph.in_edges(paper_title, data='type')
+                    if edge_type == 'cites' and citing != paper_title))
         
         return jsonify({
             'paper': paper_title,
@@ -297,79 +277,328 @@ def query_citations(paper_title):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/graph')
+@routes.route('/api/query/related/<paper_title>')
+def query_related(paper_title):
+    """Find papers related by bibliographic coupling and co-citation."""
+    from analytics.similarity import lookup_related
+    try:
+        limit = max(1, request.args.get('limit', 10, type=int))
+        related, version, stale = analytics.get('related')
+        
+        papers = []
+        with graph_store.read() as graph:
+            for title, score, shared_references, co_cited_by in lookup_related(related, paper_title, limit):
+                paper_data = graph.nodes[title]
+                papers.append({
+                    'title': title,
+                    'score': score,
+                    'shared_references': shared_references,
+                    'co_cited_by': co_cited_by,
+                    'year': paper_data.get('year', ''),
+                    'authors': paper_data.get('authors', []),
+                    'journal': paper_data.get('journal', '')
+                })
+        
+        response = jsonify({
+            'paper': paper_title,
+            'related': papers,
+            'count': len(papers)
+        })
+        response.headers['X-Graph-Version'] = str(version)
+        response.headers['X-Analytics-Stale'] = str(stale).lower()
+        return response
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def graph_version(graph):
+    """Version of a graph yielded by graph_store.read()."""
+    version = getattr(graph, 'version', None)
+    return graph_store.version if version is None else version
+
+def node_payload(node_id, node_data):
+    """Node fields sent to the visualization."""
+    return {
+        'id': node_id,
+        'type': node_data.get('type', 'unknown'),
+        'title': node_data.get('title', node_id),
+        'name': node_data.get('name', node_id),
+        'year': node_data.get('year', ''),
+        'authors': node_data.get('authors', []),
+        'journal': node_data.get('journal', '')
+    }
+
+def add_position(payload, layout):
+    """Add the precomputed x/y of a node payload when the layout has it."""
+    i = layout['index'].get(payload['id'])
+    if i is not None:
+        x, y = layout['positions'][i].tolist()
+        payload['x'] = round(x, 5)
+        payload['y'] = round(y, 5)
+    return payload
+
+def graph_statistics():
+    """Totals for the statistics panel, independent of what is rendered.
+    
+    Taken from the counts the store keeps per type, so no graph scan is needed.
+    """
+    node_counts, edge_counts = graph_store.type_counts()
+    return {
+        'papers': node_counts.get('paper', 0),
+        'authors': node_counts.get('author', 0),
+        'journals': node_counts.get('journal', 0),
+        'citations': edge_counts.get('cites', 0)
+    }
+
+def cluster_graph_data(communities, limit):
+    """Communities as supernodes with weighted inter-community links."""
+    count = min(limit, len(communities['sizes']))
+    positions = communities['positions']
+    nodes = []
+    for cluster in range(count):
+        counts = dict(zip(communities['type_names'], communities['type_counts'][cluster].tolist()))
+        x, y = positions[cluster].tolist()
+        nodes.append({
+            'id': f'cluster:{cluster}',
+            'type': 'cluster',
+            'cluster': cluster,
+            'size': int(communities['sizes'][cluster]),
+            'name': communities['representatives'][cluster],
+            'counts': {node_type: int(n) for node_type, n in counts.items() if n},
+            'x': round(x, 5),
+            'y': round(y, 5)
+        })
+    
+    # Communities beyond the limit are folded into one supernode
+    other = len(communities['sizes']) > count
+    if other:
+        sizes = communities['sizes'][count:]
+        x, y = (sizes @ positions[count:] / sizes.sum()).tolist()
+        nodes.append({
+            'id': 'cluster:other',
+            'type': 'cluster',
+            'cluster': None,
+            'size': int(sizes.sum()),
+            'name': f'{len(communities["sizes"]) - count} smaller clusters',
+            'counts': {},
+            'x': round(x, 5),
+            'y': round(y, 5)
+        })
+    
+    weights = Counter()
+    for source, target, weight in zip(*(part.tolist() for part in communities['edges'])):
+        source = f'cluster:{source}' if source < count else 'cluster:other'
+        target = f'cluster:{target}' if target < count else 'cluster:other'
+        if source != target:
+            weights[source, target] += weight
+    links = [{'source': source, 'target': target, 'type': 'cluster', 'weight': int(weight)}
+             for (source, target), weight in weights.items()]
+    return nodes, links
+
+@routes.route('/api/graph')
 def get_graph_data():
-    """Get the complete graph data for visualization."""
+    """Get graph data for visualization.
+    
+    Small graphs are returned whole. Larger ones are returned as communities
+    (`view=clusters`); `cluster=<id>` returns the members of one community.
+    """
     try:
+        max_nodes = int(os.getenv('GRAPH_MAX_NODES', 1000))
+        cluster = request.args.get('cluster', type=int)
+        view = request.args.get('view')
+        if cluster is not None:
+            view = 'cluster'
+        elif view not in ('full', 'clusters'):
+            with graph_store.read() as graph:
+                view = 'full' if graph.number_of_nodes() <= max_nodes else 'clusters'
+        
         nodes = []
         links = []
+        response = {'view': view}
+        stale = None
         
-        # Collect nodes
-        for node_id in knowledge_graph.nodes():
-            node_data = knowledge_graph.nodes[node_id]
-            node_type = node_data.get('type', 'unknown')
-            
-            nodes.append({
-                'id': node_id,
-                'type': node_type,
-                'title': node_data.get('title', node_id),
-                'name': node_data.get('name', node_id),
-                'year': node_data.get('year', ''),
-                'authors': node_data.get('authors', []),
-                'journal': node_data.get('journal', '')
-            })
+        if view == 'clusters':
+            communities, version, stale = analytics.get('communities')
+            nodes, links = cluster_graph_data(communities, max(1, request.args.get('limit', 100, type=int)))
+            response['modularity'] = communities['modularity']
+            response['version'] = version
         
-        # Collect edges
-        for source, target, data in knowledge_graph.edges(data=True):
-            links.append({
-                'source': source,
-                'target': target,
-                'type': data.get('type', 'unknown')
-            })
+        elif view == 'cluster':
+            from analytics.community import cluster_members
+            communities, version, stale = analytics.get('communities')
+            layout, _, _ = analytics.get('layout')
+            members = cluster_members(communities, cluster, max(1, request.args.get('limit', max_nodes, type=int)))
+            member_set = set(members)
+            with graph_store.read() as graph:
+                for node_id in members:
+                    if graph.has_node(node_id):
+                        nodes.append(add_position(node_payload(node_id, graph.nodes[node_id]), layout))
+                        for source, target, edge_type in graph.out_edges(node_id, data='type', default='unknown'):
+                            if target in member_set:
+                                links.append({'source': source, 'target': target, 'type': edge_type})
+            response['cluster'] = cluster
+            response['version'] = version
+            response['layout'] = layout['generation']
+            response['size'] = int(communities['sizes'][cluster]) if nodes else 0
+        
+        else:
+            layout, _, _ = analytics.get('layout')
+            response['layout'] = layout['generation']
+            with graph_store.read() as graph:
+                response['version'] = graph_version(graph)
+                
+                # Collect nodes
+                for node_id, node_data in graph.nodes(data=True):
+                    nodes.append(add_position(node_payload(node_id, node_data), layout))
+                
+                # Collect edges
+                for source, target, data in graph.edges(data=True):
+                    links.append({
+                        'source': source,
+                        'target': target,
+                        'type': data.get('type', 'unknown')
+                    })
         
+        response.update({
+            'nodes': nodes,
+            'links': links,
+            'stats': graph_statistics()
+        })
+        response = jsonify(response)
+        if stale is not None:
+            # Community views come from analytics that may lag the graph
+            response.headers['X-Graph-Version'] = str(version)
+            response.headers['X-Analytics-Stale'] = str(stale).lower()
+        return response
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@routes.route('/api/graph/changes')
+def get_graph_changes():
+    """Get the nodes and edges changed since a graph version.
+    
+    `links` lists the edges added since then and `removed_links` the edges
+    dropped because a paper's record changed.
+    
+    Returns `reset: true` when the changes are no longer logged, outnumber the
+    nodes and edges of the graph itself, or the graph has outgrown the full
+    view; the client then reloads /api/graph. Positions are only patched
+    within one layout generation (`layout`, as returned by /api/graph): after
+    a full relayout every node has moved, so that is a reset too.
+    """
+    try:
+        since = request.args.get('since', type=int)
+        if since is None:
+            return jsonify({'error': 'since must be a graph version number'}), 400
+        
+        max_nodes = int(os.getenv('GRAPH_MAX_NODES', 1000))
+        layout, _, _ = analytics.get('layout')
+        # Without a generation, any full relayout after the client's version counts
+        client_layout = request.args.get('layout', type=int)
+        relaid = (layout['generation'] != client_layout if client_layout is not None
+                  else layout['generation'] > since)
+        with graph_store.read() as graph:
+            version = graph_version(graph)
+            if relaid or graph.number_of_nodes() > max_nodes:
+                return jsonify({'version': version, 'reset': True})
+            # A delta larger than the whole graph is no cheaper than reloading it
+            changes = graph_store.changes_since(since, version,
+                                                max_records=graph.number_of_nodes() + graph.number_of_edges())
+            if changes is None:
+                return jsonify({'version': version, 'reset': True})
+            
+            changed_nodes, changed_edges, removed_edges = changes
+            nodes = [add_position(node_payload(node_id, graph.nodes[node_id]), layout)
+                     for node_id in changed_nodes if graph.has_node(node_id)]
+        
+        links = [{'source': source, 'target': target, 'type': edge_type}
+                 for source, target, edge_type in changed_edges]
+        removed_links = [{'source': source, 'target': target, 'type': edge_type}
+                         for source, target, edge_type in removed_edges]
         return jsonify({
+            'version': version,
+            'layout': layout['generation'],
+            'reset': False,
             'nodes': nodes,
-            'links': links
+            'links': links,
+            'removed_links': removed_links
         })
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/influential')
+@routes.route('/api/influential')
 def get_influential_papers():
-    """Get most influential papers based on citation count."""
+    """Get most influential papers by citation count, PageRank or HITS score."""
+    from analytics.ranking import PAPER_METRICS
     try:
-        citation_counts = {}
+        metric = request.args.get('metric', 'citations')
+        if metric not in PAPER_METRICS:
+            return jsonify({'error': f"Unknown metric. Use one of: {', '.join(PAPER_METRICS)}"}), 400
+        limit = max(1, request.args.get('limit', 10, type=int))
         
-        # Count citations for each paper
-        for node in knowledge_graph.nodes():
-            if knowledge_graph.nodes[node].get('type') == 'paper':
-                citation_count = 0
-                for other_node in knowledge_graph.nodes():
-                    if other_node != node and knowledge_graph.has_edge(other_node, node):
-                        edge_data = knowledge_graph.get_edge_data(other_node, node)
-                        if any(edge.get('type') == 'cites' for edge in edge_data.values()):
-                            citation_count += 1
-                citation_counts[node] = citation_count
+        rankings, version, stale = analytics.get('rankings')
         
-        # Sort by citation count
-        influential_papers = sorted(citation_counts.items(), key=lambda x: x[1], reverse=True)[:10]
+        result = []
+        with graph_store.read() as graph:
+            for i in rankings['order'][metric][:limit].tolist():
+                paper = rankings['papers'][i]
+                paper_data = graph.nodes[paper]
+                result.append({
+                    'title': paper,
+                    'citation_count': int(rankings['citations'][i]),
+                    'score': float(rankings[metric][i]),
+                    'year': paper_data.get('year', ''),
+                    'authors': paper_data.get('authors', []),
+                    'journal': paper_data.get('journal', '')
+                })
+        
+        response = jsonify(result)
+        response.headers['X-Graph-Version'] = str(version)
+        response.headers['X-Analytics-Stale'] = str(stale).lower()
+        return response
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@routes.route('/api/influential/authors')
+def get_influential_authors():
+    """Get authors with the highest h-index."""
+    try:
+        limit = max(1, request.args.get('limit', 10, type=int))
+        impact, version, stale = analytics.get('author_impact')
         
         result = []
-        for paper, count in influential_papers:
-            paper_data = knowledge_graph.nodes[paper]
+        for i in impact['order'][:limit].tolist():
             result.append({
-                'title': paper,
-                'citation_count': count,
-                'year': paper_data.get('year', ''),
-                'authors': paper_data.get('authors', []),
-                'journal': paper_data.get('journal', '')
+                'name': impact['authors'][i],
+                'h_index': int(impact['h_index'][i]),
+                'paper_count': int(impact['paper_count'][i]),
+                'citation_count': int(impact['citation_count'][i])
             })
         
-        return jsonify(result)
+        response = jsonify(result)
+        response.headers['X-Graph-Version'] = str(version)
+        response.headers['X-Analytics-Stale'] = str(stale).lower()
+        return response
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def create_app():
+    """Application factory: a Flask app serving the shared graph store.
+    
+    Databases and caches are not touched here; they connect on first use.
+    """
+    app = Flask(__name__)
+    app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_UPLOAD_SIZE', 16 * 1024 * 1024))
+    app.register_blueprint(routes)
+    instrument_app(app)
+    enable_profiling(app)
+    return app
+
+app = create_app()
+
 if __name__ == '__main__':
     app.run(debug=True) 
\ No newline at end of file
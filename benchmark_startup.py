@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Startup-time benchmark for the web application.
+
+Measures how quickly a worker can serve its first request:
+
+- cold start: a new interpreter imports app and serves one request, as a
+  worker does when the server does not preload the application
+- create_app(): building a configured Flask app once the modules are loaded
+- forked worker: a preloaded process forks and the child builds its app and
+  serves one request, as with `gunicorn --preload 'app:create_app()'`
+
+Usage: python benchmark_startup.py [--runs 5]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+COLD_START = """
+import time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.app.test_client().get('/api/papers')
+print(imported - start, time.perf_counter() - start)
+"""
+
+def cold_start(runs):
+    """(import seconds, first response seconds) of fresh interpreters."""
+    imports, responses = [], []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', COLD_START], cwd=ROOT, check=True,
+                                capture_output=True, text=True).stdout
+        imported, responded = map(float, output.split()[-2:])
+        imports.append(imported)
+        responses.append(responded)
+    return imports, responses
+
+def factory(create_app, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        create_app()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def forked_worker(create_app, runs):
+    """Seconds from fork until the child has served its first request."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:
+            status = create_app().test_client().get('/api/papers').status_code
+            os._exit(0 if status == 200 else 1)
+        _, status = os.waitpid(pid, 0)
+        if status:
+            raise RuntimeError("Forked worker failed to serve a request")
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def report(name, timings):
+    print(f"{name:<32} median {statistics.median(timings) * 1000:8.1f} ms   "
+          f"min {min(timings) * 1000:8.1f} ms")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='Repetitions per measurement')
+    args = parser.parse_args(argv)
+
+    imports, responses = cold_start(args.runs)
+    report('cold start: import app', imports)
+    report('cold start: first response', responses)
+
+    sys.path.insert(0, ROOT)
+    from app import create_app
+    report('create_app()', factory(create_app, args.runs))
+    if hasattr(os, 'fork'):
+        report('forked worker: first response', forked_worker(create_app, args.runs))
+
+if __name__ == '__main__':
+    main()
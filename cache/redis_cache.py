@@ -1,6 +1,8 @@
 import json
 import os
+import threading
 from dotenv import load_dotenv
+from monitoring.metrics import record_cache_lookup
 
 load_dotenv()
 
@@ -33,16 +35,28 @@ class InMemoryCache:
         return True
 
 class RedisCache:
+    """Redis-backed cache that connects on first use, not at import."""
     def __init__(self):
-        self.redis = None
+        self._redis = None
+        self._connected = False
+        self._connect_lock = threading.Lock()
         self.fallback_cache = InMemoryCache()
-        self._try_connect_redis()
+    
+    @property
+    def redis(self):
+        """Redis client, or None when Redis is not available"""
+        if not self._connected:
+            with self._connect_lock:
+                if not self._connected:
+                    self._try_connect_redis()
+                    self._connected = True
+        return self._redis
     
     def _try_connect_redis(self):
         """Try to connect to Redis, fallback to in-memory if not available"""
         try:
             import redis
-            self.redis = redis.Redis(
+            self._redis = redis.Redis(
                 host=os.getenv('REDIS_HOST', 'localhost'),
                 port=int(os.getenv('REDIS_PORT', 6379)),
                 db=int(os.getenv('REDIS_DB', 0)),
@@ -51,11 +65,11 @@ class RedisCache:
                 socket_timeout=2
             )
             # Test connection
-            self.redis.ping()
+            self._redis.ping()
             print("✅ Connected to Redis")
         except Exception as e:
             print(f"⚠️  Redis not available, using in-memory cache: {e}")
-            self.redis = None
+            self._redis = None
     
     def test_connection(self):
         """Test Redis connection"""
@@ -70,6 +84,11 @@ class RedisCache:
     
     def get(self, key):
         """Get value from cache"""
+        value = self._get(key)
+        record_cache_lookup('redis' if self.redis else 'memory', value is not None)
+        return value
+    
+    def _get(self, key):
         if self.redis:
             try:
                 value = self.redis.get(key)
@@ -114,5 +133,5 @@ class RedisCache:
                 return self.fallback_cache.clear_pattern(pattern)
         return self.fallback_cache.clear_pattern(pattern)
 
-# Global cache instance
+# Global cache instance; cheap to create, connects on first use
 cache = RedisCache() 
\ No newline at end of file
@@ -1,18 +1,39 @@
-from neo4j import GraphDatabase
-from py2neo import Graph, Node, Relationship
 import os
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
 
 class Neo4jManager:
+    """Neo4j access; the drivers are imported and connected on first use."""
     def __init__(self):
         self.uri = os.getenv('NEO4J_URI', 'bolt://localhost:7687')
         self.user = os.getenv('NEO4J_USER', 'neo4j')
         self.password = os.getenv('NEO4J_PASSWORD', 'password123')
         
-        self.driver = GraphDatabase.driver(self.uri, auth=(self.user, self.password))
-        self.graph = Graph(self.uri, auth=(self.user, self.password))
+        self._driver = None
+        self._graph = None
+        self._lock = threading.Lock()
+    
+    @property
+    def driver(self):
+        """neo4j driver, created on first access"""
+        if self._driver is None:
+            with self._lock:
+                if self._driver is None:
+                    from neo4j import GraphDatabase
+                    self._driver = GraphDatabase.driver(self.uri, auth=(self.user, self.password))
+        return self._driver
+    
+    @property
+    def graph(self):
+        """py2neo Graph, created on first access"""
+        if self._graph is None:
+            with self._lock:
+                if self._graph is None:
+                    from py2neo import Graph
+                    self._graph = Graph(self.uri, auth=(self.user, self.password))
+        return self._graph
     
     def test_connection(self):
         """Test database connection"""
@@ -49,7 +70,9 @@ class Neo4jManager:
             print(f"❌ Error creating constraints and indexes: {e}")
     
     def close(self):
-        self.driver.close()
+        if self._driver is not None:
+            self._driver.close()
+            self._driver = None
 
-# Global database instance
+# Global database instance; cheap to create, connects on first use
 db = Neo4jManager() 
\ No newline at end of file
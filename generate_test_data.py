@@ -4,10 +4,14 @@ Test data generator for the Academic Knowledge Graph application.
 This script generates various types of sample data for testing different scenarios.
 """
 
+import argparse
 import json
 import csv
 import random
+from array import array
+from bisect import bisect_left
 from datetime import datetime, timedelta
+from itertools import accumulate, islice
 
 # Sample data pools
 COMPUTER_SCIENCE_TOPICS = [
@@ -49,6 +53,18 @@ JOURNALS = [
     "Journal of Machine Learning Research"
 ]
 
+TITLE_PREFIXES = [
+    "A Novel Approach to", "Deep Learning for", "Advances in", "A Survey of",
+    "Efficient Methods for", "Scalable", "Robust", "Adaptive", "Intelligent",
+    "Automated", "Real-time", "Distributed", "Privacy-Preserving"
+]
+
+TITLE_SUFFIXES = [
+    "Systems", "Applications", "Methods", "Algorithms", "Frameworks",
+    "Models", "Architectures", "Optimization", "Analysis", "Classification",
+    "Prediction", "Recognition", "Detection", "Processing"
+]
+
 def generate_author_name():
     """Generate a random author name."""
     first = random.choice(FIRST_NAMES)
@@ -60,20 +76,8 @@ def generate_paper_title(topic=None):
     if topic is None:
         topic = random.choice(COMPUTER_SCIENCE_TOPICS)
     
-    prefixes = [
-        "A Novel Approach to", "Deep Learning for", "Advances in", "A Survey of",
-        "Efficient Methods for", "Scalable", "Robust", "Adaptive", "Intelligent",
-        "Automated", "Real-time", "Distributed", "Privacy-Preserving"
-    ]
-    
-    suffixes = [
-        "Systems", "Applications", "Methods", "Algorithms", "Frameworks",
-        "Models", "Architectures", "Optimization", "Analysis", "Classification",
-        "Prediction", "Recognition", "Detection", "Processing"
-    ]
-    
-    prefix = random.choice(prefixes)
-    suffix = random.choice(suffixes)
+    prefix = random.choice(TITLE_PREFIXES)
+    suffix = random.choice(TITLE_SUFFIXES)
     
     return f"{prefix} {topic} {suffix}"
 
@@ -200,6 +204,123 @@ def generate_highly_cited_paper_scenario():
     
     return papers
 
+class ZipfSampler:
+    """Draw ranks 0..n-1 with probability proportional to 1 / (rank + 1) ** exponent."""
+    def __init__(self, n, exponent, rng):
+        self.rng = rng
+        self.cum_weights = array('d', accumulate(1.0 / (rank + 1) ** exponent for rank in range(n)))
+        self.total = self.cum_weights[-1]
+    
+    def sample(self):
+        return bisect_left(self.cum_weights, self.rng.random() * self.total)
+
+def pool_author_name(index):
+    """Return the deterministic name of the author at position `index` in the pool."""
+    first = FIRST_NAMES[index % len(FIRST_NAMES)]
+    last = LAST_NAMES[(index // len(FIRST_NAMES)) % len(LAST_NAMES)]
+    cycle = index // (len(FIRST_NAMES) * len(LAST_NAMES))
+    return f"{first} {last}" if cycle == 0 else f"{first} {last} {cycle + 1}"
+
+def pool_journal_name(index):
+    """Return the deterministic name of the journal at position `index` in the pool."""
+    journal = JOURNALS[index % len(JOURNALS)]
+    cycle = index // len(JOURNALS)
+    return journal if cycle == 0 else f"{journal} {cycle + 1}"
+
+def synthetic_paper_title(index):
+    """Return a unique, deterministic title for the paper at position `index`.
+    
+    Titles are derived from the index so citations can refer to earlier papers
+    without keeping every generated title in memory.
+    """
+    h = (index * 2654435761) & 0xFFFFFFFF
+    prefix = TITLE_PREFIXES[h % len(TITLE_PREFIXES)]
+    h //= len(TITLE_PREFIXES)
+    topic = COMPUTER_SCIENCE_TOPICS[h % len(COMPUTER_SCIENCE_TOPICS)]
+    h //= len(COMPUTER_SCIENCE_TOPICS)
+    suffix = TITLE_SUFFIXES[h % len(TITLE_SUFFIXES)]
+    return f"{prefix} {topic} {suffix} (#{index})"
+
+def stream_citation_network(num_papers, seed=42, num_authors=10000, num_journals=200,
+                            mean_references=8, max_references=200, mean_authors=3, max_authors=12,
+                            author_exponent=1.1, journal_exponent=1.0,
+                            preferential_ratio=0.8, recency_window=1000,
+                            start_year=1990, end_year=2024):
+    """Yield a large synthetic citation network one paper at a time.
+    
+    Papers are emitted in publication order and only cite earlier papers.
+    Cited papers are drawn by preferential attachment (Price's model), so
+    citation counts follow a power law, mixed with a uniform pick from the
+    most recent `recency_window` papers. Authors and journals are drawn from
+    Zipf distributions over fixed-size pools, producing a few very prolific
+    authors and popular venues. The same seed always yields the same data.
+    
+    Reference counts are capped at `max_references` so every row stays well
+    below the csv module's 128 KiB field limit. Memory grows only with the
+    citation urn (one 8-byte entry per paper and per citation), not with the
+    papers already written.
+    """
+    rng = random.Random(seed)
+    author_sampler = ZipfSampler(num_authors, author_exponent, rng)
+    journal_sampler = ZipfSampler(num_journals, journal_exponent, rng)
+    
+    # Every paper appears once when published plus once per citation received,
+    # so a uniform draw from the urn picks papers proportional to in-degree + 1.
+    citation_urn = array('L')
+    pareto_scale = mean_references / 2.0  # paretovariate(2.0) has mean 2
+    year_span = end_year - start_year + 1
+    
+    for i in range(num_papers):
+        num_refs = min(int(rng.paretovariate(2.0) * pareto_scale), max_references, i)
+        cited = set()
+        for _ in range(num_refs * 2):
+            if len(cited) >= num_refs:
+                break
+            if rng.random() < preferential_ratio:
+                cited.add(citation_urn[rng.randrange(len(citation_urn))])
+            else:
+                cited.add(rng.randrange(max(0, i - recency_window), i))
+        
+        cited = sorted(cited)
+        citation_urn.extend(cited)
+        citation_urn.append(i)
+        
+        num_paper_authors = min(1 + int(rng.expovariate(1.0 / max(mean_authors - 1, 0.1))), max_authors)
+        authors = []
+        for _ in range(num_paper_authors):
+            author = pool_author_name(author_sampler.sample())
+            if author not in authors:
+                authors.append(author)
+        
+        yield {
+            'title': synthetic_paper_title(i),
+            'authors': authors,
+            'journal': pool_journal_name(journal_sampler.sample()),
+            'year': str(start_year + i * year_span // num_papers),
+            'cited_papers': [synthetic_paper_title(j) for j in cited]
+        }
+
+def iter_chunks(iterable, chunk_size):
+    """Yield successive lists of at most `chunk_size` items."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+def paper_to_csv_row(paper):
+    """Flatten a paper dict into the CSV upload schema."""
+    return {
+        'title': paper['title'],
+        # Convert authors list to comma-separated string
+        'authors': ', '.join(paper['authors']) if paper['authors'] else '',
+        'journal': paper['journal'],
+        'year': paper['year'],
+        # Convert cited_papers list to comma-separated string
+        'cited_papers': ', '.join(paper['cited_papers']) if paper['cited_papers'] else ''
+    }
+
 def save_as_csv(papers, filename):
     """Save papers data as CSV file."""
     with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
@@ -208,18 +329,29 @@ def save_as_csv(papers, filename):
         
         writer.writeheader()
         for paper in papers:
-            # Convert authors list to comma-separated string
-            authors_str = ', '.join(paper['authors']) if paper['authors'] else ''
-            # Convert cited_papers list to comma-separated string
-            cited_str = ', '.join(paper['cited_papers']) if paper['cited_papers'] else ''
-            
-            writer.writerow({
-                'title': paper['title'],
-                'authors': authors_str,
-                'journal': paper['journal'],
-                'year': paper['year'],
-                'cited_papers': cited_str
-            })
+            writer.writerow(paper_to_csv_row(paper))
+
+def stream_as_csv(papers, filename, chunk_size=10000):
+    """Write an iterable of papers to CSV in chunks; returns the number written."""
+    count = 0
+    with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
+        fieldnames = ['title', 'authors', 'journal', 'year', 'cited_papers']
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        
+        writer.writeheader()
+        for chunk in iter_chunks(papers, chunk_size):
+            writer.writerows(paper_to_csv_row(paper) for paper in chunk)
+            count += len(chunk)
+    return count
+
+def stream_as_ndjson(papers, filename, chunk_size=10000):
+    """Write an iterable of papers as newline-delimited JSON in chunks; returns the number written."""
+    count = 0
+    with open(filename, 'w', encoding='utf-8') as ndjsonfile:
+        for chunk in iter_chunks(papers, chunk_size):
+            ndjsonfile.write(''.join(json.dumps(paper, ensure_ascii=False) + '\n' for paper in chunk))
+            count += len(chunk)
+    return count
 
 def save_as_json(papers, filename):
     """Save papers data as JSON file."""
@@ -232,11 +364,51 @@ def generate_performance_test_data(num_papers=500):
     papers = generate_citation_network(num_papers)
     return papers
 
-def main():
+def generate_large_scale_data(args):
+    """Stream a large synthetic dataset straight to disk."""
+    output = args.output or f"generated_large_{args.papers}.{args.format}"
+    print(f"Generating {args.papers} papers (seed={args.seed}, "
+          f"{args.authors} authors, {args.journals} journals) -> {output}")
+    
+    start = datetime.now()
+    papers = stream_citation_network(args.papers,
+                                     seed=args.seed,
+                                     num_authors=args.authors,
+                                     num_journals=args.journals,
+                                     mean_references=args.mean_references,
+                                     max_references=args.max_references)
+    if args.format == 'csv':
+        count = stream_as_csv(papers, output, args.chunk_size)
+    else:
+        count = stream_as_ndjson(papers, output, args.chunk_size)
+    
+    elapsed = (datetime.now() - start).total_seconds()
+    print(f"   Created: {output} ({count} papers in {elapsed:.1f}s)")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate test data for the Academic Knowledge Graph.")
+    parser.add_argument('--papers', type=int,
+                        help="stream a large synthetic dataset with this many papers instead of the default scenarios")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--authors', type=int, default=10000, help="size of the author pool")
+    parser.add_argument('--journals', type=int, default=200, help="size of the journal pool")
+    parser.add_argument('--mean-references', type=float, default=8, help="average citations per paper")
+    parser.add_argument('--max-references', type=int, default=200, help="most citations a single paper makes")
+    parser.add_argument('--format', choices=['csv', 'ndjson'], default='csv')
+    parser.add_argument('--chunk-size', type=int, default=10000, help="papers written per chunk")
+    parser.add_argument('--output', help="output file name")
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """Generate various test datasets."""
+    args = parse_args(argv)
     print("Academic Knowledge Graph - Test Data Generator")
     print("=" * 50)
     
+    if args.papers:
+        generate_large_scale_data(args)
+        return
+    
     # Generate citation network
     print("1. Generating citation network dataset...")
     citation_network = generate_citation_network(30)
@@ -0,0 +1,163 @@
+"""
+Change tracking for incremental graph refreshes.
+
+Every write through a graph store runs against a ChangeRecorder, which passes
+calls through to the NetworkX graph and notes which nodes were added or
+updated and which edges were added or removed. When the write ends, the store
+files the recorded changes under the new graph version, so clients holding
+version N can fetch just what changed since N instead of the whole graph.
+
+Edges are recorded as (source, target, type) triples. Adding and removing the
+same edge cancel out, within a write and across merged versions, so a delta
+lists each edge at most once, as added or as removed.
+"""
+
+from collections import Counter, deque
+
+class ChangeRecorder:
+    """Proxy for a NetworkX graph that records node and edge changes.
+
+    `node_types` and `edge_types` hold the change in the number of nodes and
+    edges of each type, so stores can keep totals without rescanning.
+    """
+    def __init__(self, graph):
+        self._graph = graph
+        self._nodes = {}
+        self._edges = {}
+        self._removed_edges = {}
+        self.node_types = Counter()
+        self.edge_types = Counter()
+
+    def __getattr__(self, name):
+        return getattr(self._graph, name)
+
+    def __len__(self):
+        return len(self._graph)
+
+    def __contains__(self, node):
+        return node in self._graph
+
+    def __iter__(self):
+        return iter(self._graph)
+
+    @property
+    def graph(self):
+        return self._graph
+
+    @property
+    def nodes_changed(self):
+        """Ids of added or updated nodes, in first-change order."""
+        return list(self._nodes)
+
+    @property
+    def edges(self):
+        """Added (source, target, type) edges, in order."""
+        return list(self._edges)
+
+    @property
+    def removed_edges(self):
+        """Removed (source, target, type) edges that existed before the write."""
+        return list(self._removed_edges)
+
+    def add_node(self, node, **attrs):
+        graph = self._graph
+        old = graph.nodes[node].get('type', 'unknown') if node in graph else None
+        graph.add_node(node, **attrs)
+        new = graph.nodes[node].get('type', 'unknown')
+        if new != old:
+            self.node_types[new] += 1
+            if old is not None:
+                self.node_types[old] -= 1
+        self._nodes[node] = None
+
+    def add_edge(self, u, v, key=None, **attrs):
+        graph = self._graph
+        # add_edge creates missing endpoints implicitly
+        if u not in graph:
+            self._nodes[u] = None
+            self.node_types['unknown'] += 1
+        if v not in graph:
+            self._nodes[v] = None
+            self.node_types['unknown'] += 1
+        elif key is not None and graph.has_edge(u, v, key):
+            # Re-adding a keyed edge only updates its attributes
+            return graph.add_edge(u, v, key, **attrs)
+        edge_type = attrs.get('type', 'unknown')
+        edge = (u, v, edge_type)
+        if edge in self._removed_edges:
+            del self._removed_edges[edge]
+        else:
+            self._edges[edge] = None
+        self.edge_types[edge_type] += 1
+        return graph.add_edge(u, v, key, **attrs)
+
+    def remove_edge(self, u, v, key):
+        graph = self._graph
+        edge_type = graph.edges[u, v, key].get('type', 'unknown')
+        graph.remove_edge(u, v, key)
+        edge = (u, v, edge_type)
+        if edge in self._edges:
+            del self._edges[edge]
+        else:
+            self._removed_edges[edge] = None
+        self.edge_types[edge_type] -= 1
+
+def merge_changes(changes):
+    """Combine (nodes, edges, removed_edges) from consecutive versions into one delta."""
+    nodes = {}
+    edges = {}
+    removed = {}
+    for version_nodes, version_edges, version_removed in changes:
+        nodes.update(dict.fromkeys(version_nodes))
+        for edge in version_removed:
+            # An edge added within the range did not exist before it
+            if edge in edges:
+                del edges[edge]
+            else:
+                removed[edge] = None
+        for edge in version_edges:
+            if edge in removed:
+                del removed[edge]
+            else:
+                edges[edge] = None
+    return list(nodes), list(edges), list(removed)
+
+class ChangeLog:
+    """Bounded in-memory log of the changes made by each graph version.
+
+    Holds at most `max_records` node and edge records; once older versions are
+    dropped, requests starting before them get None and must reload in full.
+    """
+    def __init__(self, max_records=100000):
+        self.max_records = max_records
+        self.floor = 0
+        self._entries = deque()
+        self._records = 0
+
+    def append(self, version, nodes, edges, removed_edges=()):
+        self._entries.append((version, nodes, edges, removed_edges))
+        self._records += len(nodes) + len(edges) + len(removed_edges)
+        while self._records > self.max_records and self._entries:
+            dropped, dropped_nodes, dropped_edges, dropped_removed = self._entries.popleft()
+            self._records -= len(dropped_nodes) + len(dropped_edges) + len(dropped_removed)
+            self.floor = dropped
+
+    def since(self, version, current, max_records=None):
+        """(nodes, edges, removed_edges) changed after `version` up to `current`, or None.
+
+        Also None when more than `max_records` records changed, for callers
+        that would rather reload than apply a large delta.
+        """
+        if version < self.floor or version > current:
+            return None
+        changes = []
+        records = 0
+        for entry_version, nodes, edges, removed in reversed(self._entries):
+            if entry_version <= version:
+                break
+            if entry_version <= current:
+                records += len(nodes) + len(edges) + len(removed)
+                if max_records is not None and records > max_records:
+                    return None
+                changes.append((nodes, edges, removed))
+        return merge_changes(reversed(changes))
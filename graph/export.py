@@ -0,0 +1,148 @@
+"""
+Streaming export of the knowledge graph.
+
+CSV and NDJSON exports use the same paper record schema the importers accept,
+so an export uploaded into an empty instance rebuilds the same graph. GraphML
+describes every node and edge for tools such as Neo4j.
+
+Exports are generators of text chunks. The node ids are listed once, then
+rendered `chunk_size` records at a time, so memory stays flat. Shared stores
+publish immutable snapshots, and one snapshot serves a whole export. The
+in-memory graph changes in place, so each chunk takes the read lock anew and
+writers are not blocked while a client downloads; such an export lists the
+nodes present when it started, but their attributes and edges may include
+writes made while it streams.
+"""
+
+import csv
+import io
+import json
+from contextlib import nullcontext
+from xml.sax.saxutils import escape, quoteattr
+
+from graph.ingest import PAPER_FIELDS, join_list
+
+GRAPHML_NODE_KEYS = ('type', 'title', 'name', 'year', 'authors', 'journal')
+
+def paper_record(graph, paper):
+    """Importer record of one paper; citations come from its 'cites' edges."""
+    data = graph.nodes[paper]
+    return {
+        'title': paper,
+        'authors': list(data.get('authors', [])),
+        'journal': data.get('journal', ''),
+        'year': data.get('year', ''),
+        'cited_papers': [cited for _, cited, edge_type in graph.out_edges(paper, data='type')
+                         if edge_type == 'cites']
+    }
+
+def exported_papers(graph):
+    """Ids of papers added as records.
+
+    Papers only known from citations have no 'year' attribute; they are not
+    exported on their own because importing the citing paper recreates them.
+    """
+    return [node for node, data in graph.nodes(data=True)
+            if data.get('type') == 'paper' and 'year' in data]
+
+def export_source(store):
+    """Return (read, version) for one export of `store`.
+
+    `read()` yields the graph for each chunk. `version` is the single version
+    the export shows, or None when chunks read the live in-memory graph.
+    """
+    with store.read() as graph:
+        version = getattr(graph, 'version', None)
+    if version is None:
+        return store.read, None
+    # A published snapshot never changes, so it is read without the store
+    return (lambda: nullcontext(graph)), version
+
+def _chunked(read, ids, render, chunk_size):
+    for start in range(0, len(ids), chunk_size):
+        with read() as graph:
+            text = render(graph, ids[start:start + chunk_size])
+        yield text
+
+def _csv_text(rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+def iter_csv_export(read, chunk_size=1000):
+    """Yield the papers as CSV in the upload format; see export_source() for `read`."""
+    with read() as graph:
+        papers = exported_papers(graph)
+
+    def render(graph, chunk):
+        rows = []
+        for paper in chunk:
+            record = paper_record(graph, paper)
+            record['authors'] = join_list(record['authors'])
+            record['cited_papers'] = join_list(record['cited_papers'])
+            rows.append([record[field] for field in PAPER_FIELDS])
+        return _csv_text(rows)
+
+    yield _csv_text([PAPER_FIELDS])
+    yield from _chunked(read, papers, render, chunk_size)
+
+def iter_ndjson_export(read, chunk_size=1000):
+    """Yield the papers as newline-delimited JSON records."""
+    with read() as graph:
+        papers = exported_papers(graph)
+
+    def render(graph, chunk):
+        return ''.join(json.dumps(paper_record(graph, paper), ensure_ascii=False) + '\n'
+                       for paper in chunk)
+
+    yield from _chunked(read, papers, render, chunk_size)
+
+def _graphml_value(value):
+    if isinstance(value, (list, tuple)):
+        value = json.dumps(list(value), ensure_ascii=False)
+    return escape(str(value))
+
+def iter_graphml_export(read, chunk_size=1000):
+    """Yield every node and edge as GraphML.
+
+    All attributes are strings; list attributes such as 'authors' are JSON
+    encoded. Edges to nodes added after the node list was taken are left out,
+    so every edge refers to a listed node.
+    """
+    with read() as graph:
+        nodes = list(graph.nodes)
+    listed = set(nodes)
+
+    def render_nodes(graph, chunk):
+        lines = []
+        for node in chunk:
+            data = graph.nodes[node]
+            lines.append(f'    <node id={quoteattr(str(node))}>\n')
+            lines.extend(f'      <data key="n_{key}">{_graphml_value(data[key])}</data>\n'
+                         for key in GRAPHML_NODE_KEYS if key in data)
+            lines.append('    </node>\n')
+        return ''.join(lines)
+
+    def render_edges(graph, chunk):
+        return ''.join(f'    <edge source={quoteattr(str(u))} target={quoteattr(str(v))}>'
+                       f'<data key="e_type">{escape(str(edge_type))}</data></edge>\n'
+                       for node in chunk
+                       for u, v, edge_type in graph.out_edges(node, data='type', default='unknown')
+                       if v in listed)
+
+    header = ['<?xml version="1.0" encoding="UTF-8"?>\n',
+              '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n']
+    header.extend(f'  <key id="n_{key}" for="node" attr.name="{key}" attr.type="string"/>\n'
+                  for key in GRAPHML_NODE_KEYS)
+    header.append('  <key id="e_type" for="edge" attr.name="type" attr.type="string"/>\n')
+    header.append('  <graph edgedefault="directed">\n')
+    yield ''.join(header)
+    yield from _chunked(read, nodes, render_nodes, chunk_size)
+    yield from _chunked(read, nodes, render_edges, chunk_size)
+    yield '  </graph>\n</graphml>\n'
+
+EXPORT_FORMATS = {
+    'csv': (iter_csv_export, 'text/csv'),
+    'ndjson': (iter_ndjson_export, 'application/x-ndjson'),
+    'graphml': (iter_graphml_export, 'application/graphml+xml')
+}
@@ -0,0 +1,171 @@
+"""
+Parsing and normalization of paper records shared by the API and file uploads.
+
+Normalization is pure Python with no graph access, so it can run before the
+write lock is taken; only `add_paper_to_graph` touches the graph.
+
+Ingestion is idempotent: edges are keyed by their type, so adding the same
+relationship twice leaves one edge, and every paper node keeps a hash of the
+record it was built from, so re-uploaded unchanged records are skipped.
+"""
+
+import csv
+import io
+import hashlib
+import json
+
+PAPER_FIELDS = ('title', 'authors', 'journal', 'year', 'cited_papers')
+
+def split_list(value):
+    """Turn a list or a comma-separated string into a list of stripped, non-empty names.
+
+    Strings holding a JSON array are decoded, which is how CSV cells carry
+    names that contain commas.
+    """
+    if not value:
+        return []
+    if isinstance(value, str):
+        decoded = None
+        if value.lstrip().startswith('['):
+            try:
+                decoded = json.loads(value)
+            except ValueError:
+                pass
+        value = decoded if isinstance(decoded, list) else value.split(',')
+    return [str(item).strip() for item in value if str(item).strip()]
+
+def paper_hash(paper):
+    """Digest of a normalized record's fields, stored on the paper node."""
+    # Joining with separator characters is much cheaper than json.dumps;
+    # repr keeps a year of 2020 distinct from '2020'
+    content = '\x1e'.join((paper['title'], '\x1f'.join(paper['authors']), paper['journal'],
+                           repr(paper['year']), '\x1f'.join(paper['cited_papers'])))
+    return hashlib.blake2b(content.encode('utf-8'), digest_size=16).hexdigest()
+
+def join_list(items):
+    """Inverse of split_list for a CSV cell: comma-separated unless a name needs JSON."""
+    if any(',' in item for item in items) or (items and items[0].startswith('[')):
+        return json.dumps(items, ensure_ascii=False)
+    return ', '.join(items)
+
+def normalize_paper(data):
+    """Normalize a raw paper dict; returns None when it has no title."""
+    title = str(data.get('title') or '').strip()
+    if not title:
+        return None
+
+    year = data.get('year', '')
+    if year is None:
+        year = ''
+    elif isinstance(year, str):
+        year = year.strip()
+
+    paper = {
+        'title': title,
+        'authors': split_list(data.get('authors')),
+        'journal': str(data.get('journal') or '').strip(),
+        'year': year,
+        'cited_papers': split_list(data.get('cited_papers'))
+    }
+    paper['content_hash'] = paper_hash(paper)
+    return paper
+
+def iter_csv_papers(stream):
+    """Yield normalized papers from a CSV text stream.
+
+    Expected CSV columns: title, authors, journal, year, cited_papers
+    """
+    for row in csv.DictReader(stream):
+        paper = normalize_paper(row)
+        if paper:
+            yield paper
+
+def iter_csv_text(text):
+    """Yield normalized papers from decoded CSV text.
+
+    Line endings are read as universal newlines, inside quoted fields too, so
+    "Foo\r\nBar" and "Foo\nBar" name the same paper. Serial and parallel
+    uploads both parse through here, so node ids never depend on upload size.
+    """
+    return iter_csv_papers(io.StringIO(text, newline=None))
+
+def iter_json_papers(data):
+    """Yield normalized papers from a decoded JSON list."""
+    if not isinstance(data, list):
+        return
+    for item in data:
+        if isinstance(item, dict):
+            paper = normalize_paper(item)
+            if paper:
+                yield paper
+
+def iter_ndjson_papers(stream):
+    """Yield normalized papers from a newline-delimited JSON text stream."""
+    for line in stream:
+        if not line.strip():
+            continue
+        item = json.loads(line)
+        if isinstance(item, dict):
+            paper = normalize_paper(item)
+            if paper:
+                yield paper
+
+def is_unchanged(graph, paper):
+    """True when the graph already holds exactly this normalized record."""
+    paper_id = paper['title']
+    return (paper_id in graph and
+            graph.nodes[paper_id].get('content_hash') == paper['content_hash'])
+
+def changed_papers(graph, papers):
+    """The papers whose record differs from what the graph holds."""
+    return [paper for paper in papers if not is_unchanged(graph, paper)]
+
+def add_paper_to_graph(graph, paper):
+    """Add or update a normalized paper with its authors, journal and citations.
+
+    An updated record replaces the 'wrote', 'published_in' and 'cites' edges
+    of the previous one. Returns False without touching the graph when the
+    record is unchanged.
+    """
+    if is_unchanged(graph, paper):
+        return False
+    paper_id = paper['title']
+
+    if paper_id in graph:
+        authors, cited = set(paper['authors']), set(paper['cited_papers'])
+        stale = [(author, paper_id, 'wrote')
+                 for author, _, edge_type in graph.in_edges(paper_id, data='type')
+                 if edge_type == 'wrote' and author not in authors]
+        stale.extend((paper_id, target, edge_type)
+                     for _, target, edge_type in graph.out_edges(paper_id, data='type')
+                     if (edge_type == 'cites' and target not in cited) or
+                        (edge_type == 'published_in' and target != paper['journal']))
+        for source, target, edge_type in stale:
+            graph.remove_edge(source, target, edge_type)
+
+    graph.add_node(paper_id,
+                   type='paper',
+                   title=paper_id,
+                   year=paper['year'],
+                   authors=paper['authors'],
+                   journal=paper['journal'],
+                   content_hash=paper['content_hash'])
+
+    # Add author nodes and relationships
+    for author in paper['authors']:
+        graph.add_node(author, type='author', name=author)
+        graph.add_edge(author, paper_id, key='wrote', type='wrote')
+
+    # Add journal node and relationship
+    journal = paper['journal']
+    if journal:
+        graph.add_node(journal, type='journal', name=journal)
+        graph.add_edge(paper_id, journal, key='published_in', type='published_in')
+
+    # Add citation relationships
+    for cited_paper in paper['cited_papers']:
+        # Add cited paper as node if it doesn't exist
+        if not graph.has_node(cited_paper):
+            graph.add_node(cited_paper, type='paper', title=cited_paper)
+        graph.add_edge(paper_id, cited_paper, key='cites', type='cites')
+    return True
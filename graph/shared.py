@@ -0,0 +1,735 @@
+"""
+Read-only graph snapshots shared between worker processes.
+
+In multi-process mode (``GRAPH_SHARED_DIR`` set) the graph lives in versioned
+snapshot files instead of each worker's heap. A snapshot stores node ids and
+attributes as byte blobs and the edges as out/in CSR arrays; workers map the
+file with ``mmap`` and decode only what a request touches, so the page cache
+holds one copy no matter how many workers attach.
+
+All writes go through one GraphWriter process (``python -m graph.shared
+--serve``), which owns the directory's ``flock`` and the only NetworkX copy of
+the graph. Workers send it their records over a Unix socket; it applies them,
+re-encodes only the nodes and edges they changed and publishes the next
+version with an atomic rename. Readers notice the new ``CURRENT`` pointer on
+their next request. Next to each snapshot the writer stores the nodes and
+edges the write changed, so workers can answer change requests without
+diffing snapshots. While serving, it also computes the graph analytics of each
+version once for all workers (see analytics.shared).
+"""
+
+import argparse
+import fcntl
+import json
+import mmap
+import os
+import queue
+import struct
+import threading
+from contextlib import contextmanager
+from functools import cached_property
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+import networkx as nx
+import numpy as np
+
+from graph.changes import ChangeRecorder, merge_changes
+
+MAGIC = b'KGSNAP01'
+CURRENT_FILE = 'CURRENT'
+LOCK_FILE = 'writer.lock'
+SOCKET_FILE = 'writer.sock'
+KEY_FILE = 'writer.key'
+
+def snapshot_filename(version):
+    return f"graph-v{version:010d}.bin"
+
+def changes_filename(version):
+    return f"changes-v{version:010d}.json"
+
+def _encode_attrs(data):
+    attrs = {key: value for key, value in data.items() if key != 'type'}
+    return json.dumps(attrs, ensure_ascii=False, default=str).encode('utf-8')
+
+def _offsets(lengths):
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return offsets
+
+def _csr(keys, values, types, n):
+    """Group edges by `keys` (stable, so insertion order is kept) into CSR arrays."""
+    perm = np.argsort(keys, kind='stable')
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=n), out=indptr[1:])
+    return indptr, values[perm], types[perm]
+
+def _edge_key(src, dst, edge_type):
+    """One integer per (u, v, type) edge, for up to 2**28 nodes and 256 types."""
+    return (src << 36) | (dst << 8) | edge_type
+
+def _array(values, dtype):
+    return np.fromiter(values, dtype=dtype, count=len(values))
+
+class SnapshotSections:
+    """The encoded nodes and edges of a graph, ready to be written as a snapshot.
+
+    The writer keeps one instance next to its NetworkX graph and updates it
+    with the nodes and edges each write changed, so publishing a version only
+    encodes what changed instead of the whole graph.
+    """
+    def __init__(self, graph):
+        self.index = {}
+        self.id_bytes = []
+        self.attr_bytes = []
+        self.node_types = []
+        self.node_type_names = {}
+        self.edge_type_names = {}
+        self.src = np.zeros(0, dtype=np.int64)
+        self.dst = np.zeros(0, dtype=np.int64)
+        self.edge_types = np.zeros(0, dtype=np.uint8)
+        self.update(graph, list(graph.nodes), graph.edges(data='type', default='unknown'))
+
+    def update(self, graph, nodes, edges, removed_edges=()):
+        """Apply one write: encode `nodes`, add `edges` and drop `removed_edges`."""
+        for node in nodes:
+            data = graph.nodes[node]
+            node_type = self.node_type_names.setdefault(data.get('type', 'unknown'), len(self.node_type_names))
+            i = self.index.get(node)
+            if i is None:
+                self.index[node] = len(self.id_bytes)
+                self.id_bytes.append(str(node).encode('utf-8'))
+                self.attr_bytes.append(_encode_attrs(data))
+                self.node_types.append(node_type)
+            else:
+                self.attr_bytes[i] = _encode_attrs(data)
+                self.node_types[i] = node_type
+
+        if removed_edges:
+            removed = np.array([_edge_key(self.index[u], self.index[v], self.edge_type_names[edge_type])
+                                for u, v, edge_type in removed_edges], dtype=np.int64)
+            keep = ~np.isin(_edge_key(self.src, self.dst, self.edge_types.astype(np.int64)), removed)
+            self.src, self.dst, self.edge_types = self.src[keep], self.dst[keep], self.edge_types[keep]
+
+        src, dst, edge_types = [], [], []
+        for u, v, edge_type in edges:
+            src.append(self.index[u])
+            dst.append(self.index[v])
+            edge_types.append(self.edge_type_names.setdefault(edge_type, len(self.edge_type_names)))
+        if src:
+            self.src = np.concatenate([self.src, _array(src, np.int64)])
+            self.dst = np.concatenate([self.dst, _array(dst, np.int64)])
+            self.edge_types = np.concatenate([self.edge_types, _array(edge_types, np.uint8)])
+
+    def write(self, path, version):
+        """Write the snapshot file for `version` to `path`."""
+        n = len(self.id_bytes)
+        id_bytes = self.id_bytes
+        out_indptr, out_indices, out_types = _csr(self.src, self.dst, self.edge_types, n)
+        in_indptr, in_indices, in_types = _csr(self.dst, self.src, self.edge_types, n)
+
+        sections = {
+            'order': _array(sorted(range(n), key=id_bytes.__getitem__), np.int64),
+            'id_offsets': _offsets(_array([len(b) for b in id_bytes], np.int64)),
+            'id_blob': np.frombuffer(b''.join(id_bytes), dtype=np.uint8),
+            'attr_offsets': _offsets(_array([len(b) for b in self.attr_bytes], np.int64)),
+            'attr_blob': np.frombuffer(b''.join(self.attr_bytes), dtype=np.uint8),
+            'node_types': _array(self.node_types, np.uint8),
+            'out_indptr': out_indptr,
+            'out_indices': out_indices,
+            'out_types': out_types,
+            'in_indptr': in_indptr,
+            'in_indices': in_indices,
+            'in_types': in_types,
+        }
+
+        header = {
+            'version': version,
+            'nodes': n,
+            'edges': len(self.src),
+            'node_types': list(self.node_type_names),
+            'edge_types': list(self.edge_type_names),
+            'sections': {}
+        }
+        # Sections follow the JSON header, each 8-byte aligned
+        offset = 0
+        for name, array in sections.items():
+            header['sections'][name] = [offset, array.dtype.str, len(array)]
+            offset += (array.nbytes + 7) // 8 * 8
+        header_bytes = json.dumps(header).encode('utf-8')
+        data_start = (len(MAGIC) + 8 + len(header_bytes) + 7) // 8 * 8
+
+        with open(path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack('<Q', len(header_bytes)))
+            f.write(header_bytes)
+            f.write(b'\0' * (data_start - f.tell()))
+            for name, array in sections.items():
+                f.write(array.tobytes())
+                f.write(b'\0' * ((8 - array.nbytes % 8) % 8))
+            f.flush()
+            os.fsync(f.fileno())
+        return path
+
+def write_snapshot(graph, path, version):
+    """Serialize a NetworkX graph into the snapshot format at `path`."""
+    return SnapshotSections(graph).write(path, version)
+
+class _NodeView:
+    """The subset of networkx's NodeView used by the app."""
+    def __init__(self, view):
+        self._view = view
+
+    def __call__(self, data=False, default=None):
+        view = self._view
+        if data is False:
+            return iter(view)
+        if data is True:
+            return ((view._id(i), view._attrs(i)) for i in range(view._n))
+        return ((view._id(i), view._attrs(i).get(data, default)) for i in range(view._n))
+
+    def __getitem__(self, node):
+        i = self._view._index(node)
+        if i is None:
+            raise KeyError(node)
+        return self._view._attrs(i)
+
+    def __iter__(self):
+        return iter(self._view)
+
+    def __len__(self):
+        return self._view._n
+
+    def __contains__(self, node):
+        return self._view.has_node(node)
+
+class SharedGraphView:
+    """Read-only, memory-mapped graph exposing a networkx-like API."""
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a graph snapshot")
+        (header_length,) = struct.unpack_from('<Q', self._mm, len(MAGIC))
+        header_start = len(MAGIC) + 8
+        header = json.loads(self._mm[header_start:header_start + header_length])
+        data_start = (header_start + header_length + 7) // 8 * 8
+
+        self.version = header['version']
+        self._n = header['nodes']
+        self._edge_count = header['edges']
+        self.node_type_names = header['node_types']
+        self.edge_type_names = header['edge_types']
+        self._arrays = {}
+        for name, (offset, dtype, count) in header['sections'].items():
+            self._arrays[name] = np.frombuffer(self._mm, dtype=np.dtype(dtype), count=count,
+                                               offset=data_start + offset)
+        self._id_base = data_start + header['sections']['id_blob'][0]
+        self._attr_base = data_start + header['sections']['attr_blob'][0]
+        # Plain memoryviews give much cheaper scalar reads than numpy indexing
+        self._order = self._scalars(header, data_start, 'order')
+        self._id_offsets = self._scalars(header, data_start, 'id_offsets')
+        self._attr_offsets = self._scalars(header, data_start, 'attr_offsets')
+        self.nodes = _NodeView(self)
+
+    def _scalars(self, header, data_start, name):
+        offset, dtype, count = header['sections'][name]
+        start = data_start + offset
+        return memoryview(self._mm)[start:start + count * 8].cast('q')
+
+    def array(self, name):
+        """Zero-copy access to a raw section, e.g. for vectorized analytics."""
+        return self._arrays[name]
+
+    @cached_property
+    def type_counts(self):
+        """({node_type: count}, {edge_type: count}) from the type arrays."""
+        node_counts = np.bincount(self._arrays['node_types'], minlength=len(self.node_type_names))
+        edge_counts = np.bincount(self._arrays['out_types'], minlength=len(self.edge_type_names))
+        return ({name: int(count) for name, count in zip(self.node_type_names, node_counts.tolist()) if count},
+                {name: int(count) for name, count in zip(self.edge_type_names, edge_counts.tolist()) if count})
+
+    # Node decoding
+
+    def _id_bytes(self, i):
+        offsets = self._id_offsets
+        return self._mm[self._id_base + offsets[i]:self._id_base + offsets[i + 1]]
+
+    def _id(self, i):
+        return self._id_bytes(i).decode('utf-8')
+
+    def _attrs(self, i):
+        offsets = self._attr_offsets
+        attrs = json.loads(self._mm[self._attr_base + offsets[i]:self._attr_base + offsets[i + 1]])
+        attrs['type'] = self.node_type_names[self._arrays['node_types'][i]]
+        return attrs
+
+    def _index(self, node):
+        """Binary search the sorted id order; returns None for unknown nodes."""
+        key = str(node).encode('utf-8')
+        order = self._order
+        lo, hi = 0, self._n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._id_bytes(order[mid]) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._n and self._id_bytes(order[lo]) == key:
+            return order[lo]
+        return None
+
+    def node_ids(self):
+        """All node ids in index order."""
+        return [self._id(i) for i in range(self._n)]
+
+    # networkx-compatible queries
+
+    def __iter__(self):
+        return (self._id(i) for i in range(self._n))
+
+    def __len__(self):
+        return self._n
+
+    def __contains__(self, node):
+        return self.has_node(node)
+
+    def is_directed(self):
+        return True
+
+    def is_multigraph(self):
+        return True
+
+    def number_of_nodes(self):
+        return self._n
+
+    def number_of_edges(self):
+        return self._edge_count
+
+    def has_node(self, node):
+        return self._index(node) is not None
+
+    def _adjacent_arrays(self, node, direction):
+        """Zero-copy (indices, types) slices of a node's out- or in-edges."""
+        i = self._index(node)
+        if i is None:
+            raise nx.NetworkXError(f"The node {node} is not in the graph.")
+        indptr = self._arrays[f'{direction}_indptr']
+        start, end = int(indptr[i]), int(indptr[i + 1])
+        return (self._arrays[f'{direction}_indices'][start:end],
+                self._arrays[f'{direction}_types'][start:end])
+
+    def _adjacent(self, node, direction):
+        indices, types = self._adjacent_arrays(node, direction)
+        return indices.tolist(), types.tolist()
+
+    def successors(self, node):
+        indices, _ = self._adjacent(node, 'out')
+        return (self._id(j) for j in dict.fromkeys(indices))
+
+    neighbors = successors
+
+    def predecessors(self, node):
+        indices, _ = self._adjacent(node, 'in')
+        return (self._id(j) for j in dict.fromkeys(indices))
+
+    def get_edge_data(self, u, v, default=None):
+        """Edge attributes keyed by edge type, as the ingest code keys edges."""
+        target = self._index(v)
+        if target is None or not self.has_node(u):
+            return default
+        indices, types = self._adjacent_arrays(u, 'out')
+        matches = types[indices == target].tolist()
+        if not matches:
+            return default
+        return {self.edge_type_names[edge_type]: {'type': self.edge_type_names[edge_type]}
+                for edge_type in matches}
+
+    def has_edge(self, u, v):
+        return self.get_edge_data(u, v) is not None
+
+    def _edge_data(self, edge_type, data, default):
+        name = self.edge_type_names[edge_type]
+        if data is True:
+            return {'type': name}
+        return name if data == 'type' else default
+
+    def edges(self, nbunch=None, data=False, default=None):
+        return self.out_edges(nbunch, data=data, default=default)
+
+    def out_edges(self, nbunch=None, data=False, default=None):
+        if nbunch is not None:
+            nodes = [nbunch] if self.has_node(nbunch) else list(nbunch)
+            for node in nodes:
+                indices, types = self._adjacent(node, 'out')
+                for j, edge_type in zip(indices, types):
+                    yield self._edge_tuple(node, self._id(j), edge_type, data, default)
+            return
+
+        ids = self.node_ids()
+        indptr = self._arrays['out_indptr'].tolist()
+        for i in range(self._n):
+            start, end = indptr[i], indptr[i + 1]
+            if start == end:
+                continue
+            targets = self._arrays['out_indices'][start:end].tolist()
+            types = self._arrays['out_types'][start:end].tolist()
+            for j, edge_type in zip(targets, types):
+                yield self._edge_tuple(ids[i], ids[j], edge_type, data, default)
+
+    def in_edges(self, node, data=False, default=None):
+        indices, types = self._adjacent(node, 'in')
+        for j, edge_type in zip(indices, types):
+            yield self._edge_tuple(self._id(j), node, edge_type, data, default)
+
+    def _edge_tuple(self, u, v, edge_type, data, default):
+        if data is False:
+            return (u, v)
+        return (u, v, self._edge_data(edge_type, data, default))
+
+    def to_networkx(self):
+        """Materialize a mutable copy, used by the writer."""
+        graph = nx.MultiDiGraph()
+        ids = self.node_ids()
+        graph.add_nodes_from((ids[i], self._attrs(i)) for i in range(self._n))
+        indptr = self._arrays['out_indptr']
+        sources = np.repeat(np.arange(self._n), np.diff(indptr)).tolist()
+        targets = self._arrays['out_indices'].tolist()
+        types = self._arrays['out_types'].tolist()
+        names = self.edge_type_names
+        graph.add_edges_from((ids[u], ids[v], names[t], {'type': names[t]})
+                             for u, v, t in zip(sources, targets, types))
+        return graph
+
+def _prune(directory, version, keep_versions, keep_changes):
+    # Workers still mapping an unlinked snapshot keep reading it safely
+    for name in os.listdir(directory):
+        if name.startswith('graph-v') and name.endswith('.bin'):
+            if int(name[len('graph-v'):-len('.bin')]) <= version - keep_versions:
+                os.remove(os.path.join(directory, name))
+        elif name.startswith('changes-v') and name.endswith('.json'):
+            if int(name[len('changes-v'):-len('.json')]) <= version - keep_changes:
+                os.remove(os.path.join(directory, name))
+
+class GraphWriter:
+    """The one process that modifies the graph in `directory`.
+
+    Holds the writer lock for its lifetime, keeps the only mutable NetworkX
+    copy of the graph and publishes a snapshot after every write. Request
+    workers send their writes to it through serve().
+    """
+    def __init__(self, directory, keep_versions=3, keep_changes=1000):
+        self.directory = directory
+        self.keep_versions = keep_versions
+        self.keep_changes = keep_changes
+        os.makedirs(directory, exist_ok=True)
+        self._lock_file = open(os.path.join(directory, LOCK_FILE), 'a')
+        try:
+            # Raises BlockingIOError while another writer owns the directory
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self._lock_file.close()
+            raise
+        self._write_lock = threading.RLock()
+        self._recorder = None
+        self._pending = queue.SimpleQueue()
+        self._listener = None
+        self._analytics = None
+
+        current = os.path.join(directory, CURRENT_FILE)
+        if os.path.exists(current):
+            with open(current) as f:
+                view = SharedGraphView(os.path.join(directory, f.read().strip()))
+            self.version = view.version
+            self.graph = view.to_networkx()
+        else:
+            self.version = None
+            self.graph = nx.MultiDiGraph()
+        self._sections = SnapshotSections(self.graph)
+        if self.version is None:
+            self._publish(0, ChangeRecorder(self.graph))
+
+    @contextmanager
+    def write(self):
+        """Yield the graph wrapped in a ChangeRecorder and publish on exit."""
+        with self._write_lock:
+            if self._recorder is not None:
+                yield self._recorder
+                return
+            self._recorder = ChangeRecorder(self.graph)
+            try:
+                yield self._recorder
+            finally:
+                # Publish even on failure so the snapshot matches the graph
+                recorder, self._recorder = self._recorder, None
+                self._publish(self.version + 1, recorder)
+
+    def apply(self, records, apply_fn):
+        """Apply all records in one write so a single version is published."""
+        records = list(records)
+        if not records:
+            return []
+        with self.write() as graph:
+            return [apply_fn(graph, record) for record in records]
+
+    def _publish(self, version, recorder):
+        self._sections.update(self.graph, recorder.nodes_changed, recorder.edges, recorder.removed_edges)
+        filename = snapshot_filename(version)
+        path = os.path.join(self.directory, filename)
+        self._sections.write(path + '.tmp', version)
+        os.replace(path + '.tmp', path)
+
+        # The change file must exist before CURRENT points at the version
+        changes = os.path.join(self.directory, changes_filename(version))
+        nodes, edges, removed = recorder.nodes_changed, recorder.edges, recorder.removed_edges
+        with open(changes + '.tmp', 'w', encoding='utf-8') as f:
+            # A header line with the record count lets readers skip large deltas unparsed
+            f.write(json.dumps({'records': len(nodes) + len(edges) + len(removed)}) + '\n')
+            json.dump({'nodes': nodes, 'edges': edges, 'removed': removed}, f)
+        os.replace(changes + '.tmp', changes)
+
+        current = os.path.join(self.directory, CURRENT_FILE)
+        with open(current + '.tmp', 'w') as f:
+            f.write(filename)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(current + '.tmp', current)
+
+        self.version = version
+        _prune(self.directory, version, self.keep_versions, self.keep_changes)
+        if self._analytics is not None:
+            self._analytics.notify()
+
+    def serve(self):
+        """Accept writes from SharedGraphStore.apply() until close() is called.
+
+        Requests that arrive while a version is being published are applied
+        together in the next write, so a burst of writes costs one publish.
+        Analytics are computed in a background thread after each version.
+        """
+        from analytics.shared import AnalyticsPublisher
+        address = os.path.join(self.directory, SOCKET_FILE)
+        if os.path.exists(address):
+            # Left behind by a writer that died; we hold the writer lock
+            os.remove(address)
+        authkey = os.urandom(32)
+        key_path = os.path.join(self.directory, KEY_FILE)
+        descriptor = os.open(key_path + '.tmp', os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(descriptor, 'wb') as f:
+            f.write(authkey)
+        os.replace(key_path + '.tmp', key_path)
+
+        self._analytics = AnalyticsPublisher(self.directory, keep_versions=self.keep_versions)
+        self._analytics.notify()
+        threading.Thread(target=self._analytics.run, name='graph-analytics', daemon=True).start()
+
+        self._listener = Listener(address, family='AF_UNIX', authkey=authkey)
+        threading.Thread(target=self._commit_loop, name='graph-writer', daemon=True).start()
+        while True:
+            try:
+                conn = self._listener.accept()
+            except AuthenticationError:
+                continue
+            except OSError:
+                if self._listener is None:
+                    return
+                raise
+            threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+
+    def _serve_connection(self, conn):
+        with conn:
+            try:
+                apply_fn, records = conn.recv()
+            except EOFError:
+                return
+            reply = queue.SimpleQueue()
+            self._pending.put((apply_fn, records, reply))
+            conn.send(reply.get())
+
+    def _commit_loop(self):
+        while True:
+            batch = [self._pending.get()]
+            while True:
+                try:
+                    batch.append(self._pending.get_nowait())
+                except queue.Empty:
+                    break
+            replies = []
+            try:
+                with self.write() as graph:
+                    for apply_fn, records, reply in batch:
+                        try:
+                            replies.append((reply, (True, [apply_fn(graph, record) for record in records])))
+                        except Exception as e:
+                            replies.append((reply, (False, str(e))))
+            except Exception as e:
+                replies = [(reply, (False, str(e))) for _, _, reply in batch]
+            for reply, message in replies:
+                reply.put(message)
+
+    def close(self):
+        """Stop serving and release the writer lock."""
+        listener, self._listener = self._listener, None
+        if listener is not None:
+            listener.close()
+        self._lock_file.close()
+
+class SharedGraphStore:
+    """GraphStore counterpart backed by published snapshots in `directory`.
+
+    Offers the same read()/apply() interface, so request handlers do not need
+    to know which mode they run in. Reads map the latest snapshot; writes are
+    sent to the GraphWriter serving the directory, so request workers never
+    hold a mutable copy of the graph.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self._view = None
+        self._current_stat = None
+        self._refresh_lock = threading.Lock()
+
+    @property
+    def version(self):
+        view = self._current_view()
+        return view.version if view is not None else 0
+
+    def _read_current(self):
+        with open(os.path.join(self.directory, CURRENT_FILE)) as f:
+            return f.read().strip()
+
+    def _current_view(self):
+        """Return the newest published view, remapping only when CURRENT changed."""
+        path = os.path.join(self.directory, CURRENT_FILE)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return self._view
+        stamp = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        if stamp == self._current_stat and self._view is not None:
+            return self._view
+        with self._refresh_lock:
+            if stamp != self._current_stat or self._view is None:
+                filename = self._read_current()
+                if self._view is None or os.path.basename(self._view.path) != filename:
+                    self._view = SharedGraphView(os.path.join(self.directory, filename))
+                self._current_stat = stamp
+        return self._view
+
+    @contextmanager
+    def read(self):
+        """Yield the latest published snapshot; it never changes underneath the reader."""
+        view = self._current_view()
+        # Nothing is published until a writer has started
+        yield view if view is not None else nx.MultiDiGraph()
+
+    def apply(self, records, apply_fn):
+        """Send the records to the writer and wait until their version is published.
+
+        `apply_fn` must be a module-level function, as it is pickled by name.
+        """
+        records = list(records)
+        if not records:
+            return []
+        try:
+            with open(os.path.join(self.directory, KEY_FILE), 'rb') as f:
+                authkey = f.read()
+            conn = Client(os.path.join(self.directory, SOCKET_FILE), family='AF_UNIX', authkey=authkey)
+        except (FileNotFoundError, ConnectionRefusedError):
+            raise RuntimeError(f"No graph writer is serving {self.directory}; "
+                               f"start one with: python -m graph.shared --dir {self.directory} --serve")
+        with conn:
+            conn.send((apply_fn, records))
+            ok, result = conn.recv()
+        if not ok:
+            raise RuntimeError(result)
+        self._current_view()
+        return result
+
+    def type_counts(self):
+        """({node_type: count}, {edge_type: count}) of the latest snapshot."""
+        view = self._current_view()
+        return view.type_counts if view is not None else ({}, {})
+
+    def changes_since(self, version, current=None, max_records=None):
+        """(nodes, edges, removed_edges) changed after `version`, or None if no longer kept.
+
+        Also None when more than `max_records` records changed; only the
+        header line of each change file is read to find out.
+        """
+        if current is None:
+            current = self.version
+        if version > current:
+            return None
+        paths = [os.path.join(self.directory, changes_filename(changed_version))
+                 for changed_version in range(version + 1, current + 1)]
+        # Count first, then parse; at most one change file is open at a time
+        records = 0
+        for path in paths:
+            try:
+                with open(path, encoding='utf-8') as f:
+                    records += json.loads(f.readline())['records']
+            except FileNotFoundError:
+                return None
+            if max_records is not None and records > max_records:
+                return None
+        changes = []
+        for path in paths:
+            try:
+                with open(path, encoding='utf-8') as f:
+                    f.readline()
+                    data = json.load(f)
+            except FileNotFoundError:
+                # Pruned since it was counted
+                return None
+            changes.append((data['nodes'], [tuple(edge) for edge in data['edges']],
+                            [tuple(edge) for edge in data['removed']]))
+        return merge_changes(changes)
+
+def main(argv=None):
+    """Load CSV/JSON/NDJSON files into the shared graph and optionally serve writes."""
+    from graph.ingest import iter_json_papers, add_paper_to_graph
+    from graph.parallel import parse_file
+
+    parser = argparse.ArgumentParser(description="Publish and serve the shared graph.")
+    parser.add_argument('--dir', default=os.getenv('GRAPH_SHARED_DIR'), required=os.getenv('GRAPH_SHARED_DIR') is None)
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help="Processes parsing CSV/NDJSON files (default: one per core)")
+    parser.add_argument('--serve', action='store_true',
+                        help="Keep running as the writer that request workers send their writes to")
+    parser.add_argument('files', nargs='*')
+    args = parser.parse_args(argv)
+
+    papers = []
+    for filename in args.files:
+        if filename.endswith('.csv'):
+            papers.extend(parse_file(filename, 'csv', workers=args.workers))
+        elif filename.endswith(('.ndjson', '.jsonl')):
+            papers.extend(parse_file(filename, 'ndjson', workers=args.workers))
+        else:
+            with open(filename, encoding='utf-8') as f:
+                papers.extend(iter_json_papers(json.load(f)))
+
+    try:
+        writer = GraphWriter(args.dir)
+    except BlockingIOError:
+        if args.serve:
+            parser.error(f"another writer is already serving {args.dir}")
+        # A writer is already running; hand it the papers
+        writer = None
+        SharedGraphStore(args.dir).apply(papers, add_paper_to_graph)
+    else:
+        writer.apply(papers, add_paper_to_graph)
+
+    store = SharedGraphStore(args.dir)
+    with store.read() as graph:
+        print(f"Published version {store.version}: {graph.number_of_nodes()} nodes, "
+              f"{graph.number_of_edges()} edges")
+    if args.serve:
+        print(f"Serving writes for {args.dir}")
+        writer.serve()
+    elif writer is not None:
+        writer.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""
+Thread-safe access to the in-memory knowledge graph.
+
+NetworkX graphs are not safe to iterate while another thread mutates them, so
+every access goes through a GraphStore: readers share the graph under a
+readers-writer lock and writers get exclusive access. Each completed write
+batch bumps `version`, which caches can use as a key.
+"""
+
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from itertools import islice
+
+import networkx as nx
+
+from graph.changes import ChangeLog, ChangeRecorder
+
+class ReadWriteLock:
+    """Many concurrent readers or a single writer.
+
+    Waiting writers block new readers so a steady stream of reads cannot
+    starve ingestion. Both sides are reentrant for the thread holding them,
+    and the writer may also take the read side.
+    """
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None
+        self._writers_waiting = 0
+        self._local = threading.local()
+
+    def _depth(self, side):
+        return getattr(self._local, side, 0)
+
+    def acquire_read(self):
+        if self._depth('read') or self._writer == threading.get_ident():
+            self._local.read = self._depth('read') + 1
+            return
+        with self._cond:
+            while self._writer is not None or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        self._local.read = 1
+
+    def release_read(self):
+        self._local.read = self._depth('read') - 1
+        if self._local.read or self._writer == threading.get_ident():
+            return
+        with self._cond:
+            self._readers -= 1
+            if self._readers == 0:
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        me = threading.get_ident()
+        if self._writer == me:
+            self._local.write = self._depth('write') + 1
+            return
+        if self._depth('read'):
+            raise RuntimeError("Cannot upgrade a read lock to a write lock")
+        with self._cond:
+            self._writers_waiting += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._cond.wait()
+            finally:
+                self._writers_waiting -= 1
+            self._writer = me
+        self._local.write = 1
+
+    def release_write(self):
+        self._local.write = self._depth('write') - 1
+        if self._local.write:
+            return
+        with self._cond:
+            self._writer = None
+            self._cond.notify_all()
+
+class GraphStore:
+    """Owns the knowledge graph and serializes writers against readers."""
+    def __init__(self, graph=None, ingest_batch_size=500, change_log_size=100000):
+        self.graph = graph if graph is not None else nx.MultiDiGraph()
+        self.lock = ReadWriteLock()
+        self.version = 0
+        self.ingest_batch_size = ingest_batch_size
+        self.changes = ChangeLog(change_log_size)
+        self._recorder = None
+        # Totals by type, kept up to date from each write's recorder
+        self._node_types = Counter(node_type for _, node_type in self.graph.nodes(data='type', default='unknown'))
+        self._edge_types = Counter(edge_type for _, _, edge_type in self.graph.edges(data='type', default='unknown'))
+
+    @contextmanager
+    def read(self):
+        """Yield the graph for reading; writers wait until the block exits."""
+        self.lock.acquire_read()
+        try:
+            yield self.graph
+        finally:
+            self.lock.release_read()
+
+    @contextmanager
+    def write(self):
+        """Yield the graph for exclusive modification and bump the version.
+
+        The graph is wrapped in a ChangeRecorder so the additions are logged
+        under the new version.
+        """
+        self.lock.acquire_write()
+        if self.lock._depth('write') == 1:
+            self._recorder = ChangeRecorder(self.graph)
+        try:
+            yield self._recorder
+        finally:
+            # Bump even on failure: a partial batch still changed the graph
+            if self.lock._depth('write') == 1:
+                self.version += 1
+                self.changes.append(self.version, self._recorder.nodes_changed, self._recorder.edges,
+                                    self._recorder.removed_edges)
+                self._node_types.update(self._recorder.node_types)
+                self._edge_types.update(self._recorder.edge_types)
+                self._recorder = None
+            self.lock.release_write()
+
+    def type_counts(self):
+        """({node_type: count}, {edge_type: count}) without scanning the graph."""
+        with self.read():
+            return ({name: count for name, count in self._node_types.items() if count},
+                    {name: count for name, count in self._edge_types.items() if count})
+
+    def changes_since(self, version, current=None, max_records=None):
+        """(nodes, edges, removed_edges) changed after `version`, or None if no longer logged.
+
+        Also None when more than `max_records` records changed.
+        """
+        return self.changes.since(version, self.version if current is None else current, max_records)
+
+    def apply(self, records, apply_fn):
+        """Apply `apply_fn(graph, record)` to every record in write batches.
+
+        The lock is released between batches so readers are not blocked for
+        the duration of a large upload. Returns the list of results.
+        """
+        results = []
+        iterator = iter(records)
+        while True:
+            batch = list(islice(iterator, self.ingest_batch_size or None))
+            if not batch:
+                return results
+            with self.write() as graph:
+                results.extend(apply_fn(graph, record) for record in batch)
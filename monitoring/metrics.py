@@ -0,0 +1,207 @@
+"""
+Lightweight request metrics exposed in the Prometheus text format.
+
+The collectors below are deliberately minimal: each update is a dict lookup
+and a few additions under a per-metric lock, so instrumenting every request
+costs a few microseconds. Values that are expensive to keep up to date (such
+as graph sizes) are registered as callbacks and only computed on scrape.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, g, request
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labelnames, labelvalues, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(f'{extra[0]}="{_escape(extra[1])}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class Metric:
+    """Base class holding one value per combination of label values."""
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def items(self):
+        """Return a snapshot of (labelvalues, value) pairs."""
+        with self._lock:
+            return [(labels, list(value) if isinstance(value, list) else value)
+                    for labels, value in self._values.items()]
+
+    def samples(self):
+        """Return (suffix, labelvalues, extra_label, value) tuples for rendering."""
+        return [('', labels, None, value) for labels, value in self.items()]
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for suffix, labels, extra, value in self.samples():
+            lines.append(f'{self.name}{suffix}{_format_labels(self.labelnames, labels, extra)} '
+                         f'{_format_value(value)}')
+        return '\n'.join(lines)
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def get(self, *labelvalues):
+        return self._values.get(labelvalues, 0)
+
+class Gauge(Metric):
+    """Gauge set directly or computed on scrape from a callback.
+
+    A callback returns a mapping of label-value tuples to numbers.
+    """
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def set(self, value, *labelvalues):
+        with self._lock:
+            self._values[labelvalues] = value
+
+    def set_function(self, callback):
+        self.callback = callback
+
+    def samples(self):
+        if self.callback is None:
+            return super().samples()
+        return [('', tuple(labels), None, value) for labels, value in self.callback().items()]
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labelvalues):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labelvalues)
+            if state is None:
+                # One slot per bucket plus +Inf, then sum
+                state = self._values[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    def samples(self):
+        samples = []
+        for labels, state in self.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), state):
+                cumulative += count
+                samples.append(('_bucket', labels, ('le', _format_value(bound)), cumulative))
+            samples.append(('_sum', labels, None, state[-1]))
+            samples.append(('_count', labels, None, cumulative))
+        return samples
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def render(self):
+        """Render every registered metric in the Prometheus text format."""
+        return '\n'.join(metric.render() for metric in self._metrics.values()) + '\n'
+
+# Global metrics registry
+metrics = MetricsRegistry()
+
+REQUEST_LATENCY = metrics.register(Histogram(
+    'http_request_duration_seconds', 'Request latency in seconds', ('route', 'method')))
+REQUEST_COUNT = metrics.register(Counter(
+    'http_requests_total', 'Total HTTP requests', ('route', 'method', 'status')))
+REQUEST_ERRORS = metrics.register(Counter(
+    'http_request_errors_total', 'HTTP requests that returned a 5xx status', ('route', 'method')))
+REQUEST_SIZE = metrics.register(Histogram(
+    'http_request_size_bytes', 'Request body size in bytes', ('route', 'method'), SIZE_BUCKETS))
+RESPONSE_SIZE = metrics.register(Histogram(
+    'http_response_size_bytes', 'Response body size in bytes', ('route', 'method'), SIZE_BUCKETS))
+CACHE_REQUESTS = metrics.register(Counter(
+    'cache_requests_total', 'Cache lookups by result', ('cache', 'result')))
+CACHE_HIT_RATIO = metrics.register(Gauge(
+    'cache_hit_ratio', 'Cache hit ratio since startup', ('cache',)))
+GRAPH_NODES = metrics.register(Gauge(
+    'graph_nodes', 'Number of nodes in the knowledge graph by type', ('type',)))
+GRAPH_EDGES = metrics.register(Gauge(
+    'graph_edges', 'Number of edges in the knowledge graph by type', ('type',)))
+
+def record_cache_lookup(cache_name, hit):
+    """Count a cache lookup for the hit-ratio metrics."""
+    CACHE_REQUESTS.inc(cache_name, 'hit' if hit else 'miss')
+
+def _cache_hit_ratios():
+    totals = {}
+    for (cache_name, result), count in CACHE_REQUESTS.items():
+        hits, lookups = totals.get(cache_name, (0, 0))
+        totals[cache_name] = (hits + (count if result == 'hit' else 0), lookups + count)
+    return {(name,): hits / lookups for name, (hits, lookups) in totals.items() if lookups}
+
+CACHE_HIT_RATIO.set_function(_cache_hit_ratios)
+
+def _route_label():
+    rule = request.url_rule
+    return rule.rule if rule is not None else '<unmatched>'
+
+def instrument_app(app, endpoint='/metrics'):
+    """Time every request and expose the registry on `endpoint`."""
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        start = g.pop('_metrics_start', None)
+        if start is None:
+            return response
+
+        route = _route_label()
+        method = request.method
+        REQUEST_LATENCY.observe(time.perf_counter() - start, route, method)
+        REQUEST_COUNT.inc(route, method, str(response.status_code))
+        if response.status_code >= 500:
+            REQUEST_ERRORS.inc(route, method)
+        REQUEST_SIZE.observe(request.content_length or 0, route, method)
+        if not response.is_streamed:
+            RESPONSE_SIZE.observe(response.calculate_content_length() or 0, route, method)
+        return response
+
+    @app.route(endpoint)
+    def prometheus_metrics():
+        """Expose collected metrics in Prometheus text format."""
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+    return app
@@ -0,0 +1,285 @@
+"""
+Opt-in request profiling.
+
+Two modes are available:
+
+* On demand: a request carrying ``X-Profile: cprofile`` (or ``?profile=cprofile``)
+  runs under the deterministic cProfile profiler; ``X-Profile: sample`` uses the
+  stack sampler instead. On-demand profiling requires ``X-Profile-Token`` to
+  match the ``PROFILING_TOKEN`` environment variable and is disabled when it is
+  unset. The report is kept in memory (and dumped to ``PROFILING_DIR`` if set)
+  and its id returned in the ``X-Profile-Id`` header; ``X-Profile-Output: inline``
+  returns the report in place of the normal response body.
+* Background sampling: with ``PROFILING_SAMPLE_RATE=N`` one request in N is
+  sampled by a background thread and folded into per-route aggregates, served
+  from ``/debug/profiles/sampled``.
+
+Streamed responses (such as ``/api/export/*``) do their work while the body is
+iterated, after the request hooks have run. An on-demand profile buffers such a
+body before stopping the profiler, so the report covers the generator; a
+background sample keeps the sampler running until the stream is closed.
+"""
+
+import cProfile
+import hmac
+import itertools
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+
+from flask import g, jsonify, request
+
+from monitoring.metrics import _route_label
+
+DEFAULT_TOP_N = 25
+
+def _function_key(code):
+    return f"{code.co_filename}:{code.co_firstlineno}({code.co_name})"
+
+class StackSampler:
+    """Background thread that samples the stacks of registered threads.
+
+    Each registered thread gets its own pair of counters: samples where a
+    function was on top of the stack (self) and samples where it appeared
+    anywhere in the stack (total).
+    """
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self._targets = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._thread = None
+
+    def _ensure_running(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+            self._thread.start()
+
+    def start(self, thread_id):
+        with self._lock:
+            self._targets[thread_id] = {'samples': 0, 'self': Counter(), 'total': Counter()}
+            self._ensure_running()
+            self._wakeup.notify()
+
+    def stop(self, thread_id):
+        with self._lock:
+            return self._targets.pop(thread_id, None)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                # Sleep without polling while no request is being sampled
+                while not self._targets:
+                    self._wakeup.wait()
+            time.sleep(self.interval)
+            with self._lock:
+                frames = sys._current_frames()
+                for thread_id, counts in self._targets.items():
+                    frame = frames.get(thread_id)
+                    if frame is None:
+                        continue
+                    counts['samples'] += 1
+                    counts['self'][_function_key(frame.f_code)] += 1
+                    seen = set()
+                    while frame is not None:
+                        key = _function_key(frame.f_code)
+                        if key not in seen:
+                            seen.add(key)
+                            counts['total'][key] += 1
+                        frame = frame.f_back
+
+def summarize_samples(counts, top_n=DEFAULT_TOP_N):
+    """Top-N functions by inclusive samples from a sampler result."""
+    samples = counts['samples'] or 1
+    return {
+        'profiler': 'sample',
+        'samples': counts['samples'],
+        'functions': [{
+            'function': function,
+            'self_samples': counts['self'][function],
+            'total_samples': total,
+            'self_percent': round(100.0 * counts['self'][function] / samples, 2),
+            'total_percent': round(100.0 * total / samples, 2)
+        } for function, total in counts['total'].most_common(top_n)]
+    }
+
+def summarize_cprofile(profiler, top_n=DEFAULT_TOP_N, sort='cumulative'):
+    """Top-N functions from a cProfile run."""
+    stats = pstats.Stats(profiler)
+    stats.sort_stats(sort)
+    functions = []
+    for func in stats.fcn_list[:top_n]:
+        primitive_calls, calls, total_time, cumulative_time, _ = stats.stats[func]
+        filename, lineno, name = func
+        functions.append({
+            'function': f"{filename}:{lineno}({name})",
+            'calls': calls,
+            'primitive_calls': primitive_calls,
+            'total_time': round(total_time, 6),
+            'cumulative_time': round(cumulative_time, 6)
+        })
+    return {'profiler': 'cprofile', 'total_time': round(stats.total_tt, 6), 'functions': functions}
+
+class RequestProfiler:
+    def __init__(self, token=None, sample_rate=0, output_dir=None, max_reports=50):
+        self.token = token
+        self.sample_rate = sample_rate
+        self.output_dir = output_dir
+        self.sampler = StackSampler()
+        self.reports = {}
+        self._report_ids = deque()
+        self.max_reports = max_reports
+        self.aggregates = {}
+        self._aggregate_lock = threading.Lock()
+        self._request_counter = itertools.count(1)
+
+    def is_authorized(self):
+        supplied = request.headers.get('X-Profile-Token', '')
+        # compare_digest only accepts ASCII str, so compare the encoded bytes
+        return bool(self.token) and hmac.compare_digest(supplied.encode('utf-8'), self.token.encode('utf-8'))
+
+    def requested_mode(self):
+        mode = request.headers.get('X-Profile') or request.args.get('profile')
+        if not mode:
+            return None
+        mode = mode.lower()
+        return 'sample' if mode == 'sample' else 'cprofile'
+
+    def store_report(self, report):
+        report_id = uuid.uuid4().hex[:12]
+        self.reports[report_id] = report
+        self._report_ids.append(report_id)
+        while len(self._report_ids) > self.max_reports:
+            self.reports.pop(self._report_ids.popleft(), None)
+        return report_id
+
+    def dump_stats(self, report_id, profiler):
+        if not self.output_dir:
+            return
+        os.makedirs(self.output_dir, exist_ok=True)
+        profiler.dump_stats(os.path.join(self.output_dir, f"{report_id}.prof"))
+
+    def aggregate(self, route, counts):
+        with self._aggregate_lock:
+            totals = self.aggregates.setdefault(route, {
+                'requests': 0, 'samples': 0, 'self': Counter(), 'total': Counter()})
+            totals['requests'] += 1
+            totals['samples'] += counts['samples']
+            totals['self'].update(counts['self'])
+            totals['total'].update(counts['total'])
+
+    def sampled_summary(self, route=None, top_n=DEFAULT_TOP_N):
+        with self._aggregate_lock:
+            routes = [route] if route else list(self.aggregates)
+            result = {}
+            for name in routes:
+                totals = self.aggregates.get(name)
+                if totals:
+                    summary = summarize_samples(totals, top_n)
+                    summary['requests'] = totals['requests']
+                    result[name] = summary
+            return result
+
+def _top_n():
+    try:
+        return max(1, int(request.args.get('profile_top', DEFAULT_TOP_N)))
+    except ValueError:
+        return DEFAULT_TOP_N
+
+def enable_profiling(app, token=None, sample_rate=None, output_dir=None):
+    """Register the profiling hooks and the /debug/profiles endpoints."""
+    profiler = RequestProfiler(
+        token=token if token is not None else os.getenv('PROFILING_TOKEN'),
+        sample_rate=sample_rate if sample_rate is not None else int(os.getenv('PROFILING_SAMPLE_RATE', 0)),
+        output_dir=output_dir if output_dir is not None else os.getenv('PROFILING_DIR'))
+    app.extensions['request_profiler'] = profiler
+
+    @app.before_request
+    def _start_profiling():
+        mode = profiler.requested_mode()
+        if mode and profiler.is_authorized():
+            g._profile = {'mode': mode, 'on_demand': True}
+        elif profiler.sample_rate and next(profiler._request_counter) % profiler.sample_rate == 0:
+            g._profile = {'mode': 'sample', 'on_demand': False}
+        else:
+            return
+
+        if g._profile['mode'] == 'cprofile':
+            g._profile['profiler'] = cProfile.Profile()
+            g._profile['profiler'].enable()
+        else:
+            profiler.sampler.start(threading.get_ident())
+
+    def _stop_profiling():
+        state = g.pop('_profile', None)
+        if state is None:
+            return None, None
+        if state['mode'] == 'cprofile':
+            state['profiler'].disable()
+            return state, summarize_cprofile(state['profiler'], _top_n())
+        counts = profiler.sampler.stop(threading.get_ident())
+        if not state['on_demand']:
+            profiler.aggregate(_route_label(), counts)
+            return state, None
+        return state, summarize_samples(counts, _top_n())
+
+    def _sample_stream(chunks, route, thread_id):
+        try:
+            yield from chunks
+        finally:
+            profiler.aggregate(route, profiler.sampler.stop(thread_id))
+
+    @app.after_request
+    def _finish_profiling(response):
+        state = g.get('_profile')
+        if state is not None and response.is_streamed:
+            if not state['on_demand']:
+                # Teardown runs before the body is sent; the stream stops the sampler
+                g.pop('_profile')
+                response.response = _sample_stream(response.response, _route_label(),
+                                                   threading.get_ident())
+                return response
+            # Run the body generator under the profiler
+            response.make_sequence()
+        state, report = _stop_profiling()
+        if report is None:
+            return response
+
+        report.update({'route': _route_label(), 'method': request.method, 'status': response.status_code})
+        report_id = profiler.store_report(report)
+        if state['mode'] == 'cprofile':
+            profiler.dump_stats(report_id, state['profiler'])
+
+        output = request.headers.get('X-Profile-Output') or request.args.get('profile_output')
+        if output == 'inline':
+            response = jsonify({'profile_id': report_id, 'profile': report})
+        response.headers['X-Profile-Id'] = report_id
+        return response
+
+    @app.teardown_request
+    def _abort_profiling(exc):
+        # Requests that raised past the error handlers never reach after_request
+        _stop_profiling()
+
+    @app.route('/debug/profiles/<report_id>')
+    def get_profile_report(report_id):
+        """Return a stored on-demand profiling report."""
+        if not profiler.is_authorized():
+            return jsonify({'error': 'Profiling access denied'}), 403
+        report = profiler.reports.get(report_id)
+        if report is None:
+            return jsonify({'error': 'Profile not found'}), 404
+        return jsonify(report)
+
+    @app.route('/debug/profiles/sampled')
+    def get_sampled_profiles():
+        """Return aggregated background samples, optionally for one route."""
+        if not profiler.is_authorized():
+            return jsonify({'error': 'Profiling access denied'}), 403
+        return jsonify(profiler.sampled_summary(request.args.get('route'), _top_n()))
+
+    return profiler
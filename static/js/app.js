@@ -1,9 +1,16 @@
 // Global variables
-let svg, g, simulation, nodes = [], links = [];
+let svg, g, linkLayer, nodeLayer, labelLayer, simulation, nodes = [], links = [];
 let width = 800, height = 550;
 let showLabels = true;
 let currentZoom = 1;
 let selectedFile = null;
+let currentCluster = null;
+let graphStats = null;
+let graphVersion = null;
+let graphView = null;
+let layoutMode = 'server';
+let layoutTransform = null;
+let layoutGeneration = null;
 
 // Initialize the application when DOM is loaded
 document.addEventListener('DOMContentLoaded', function() {
@@ -37,8 +44,11 @@ function initializeGraph() {
         .attr('fill', '#999')
         .style('stroke', 'none');
 
-    // Create main group for zooming and panning
+    // Create main group for zooming and panning, with layers so new links stay below nodes
     g = svg.append('g');
+    linkLayer = g.append('g');
+    nodeLayer = g.append('g');
+    labelLayer = g.append('g');
 
     // Add zoom behavior
     const zoom = d3.zoom()
@@ -86,8 +96,10 @@ function setupEventListeners() {
     document.getElementById('zoom-out').addEventListener('click', () => zoomGraph(0.8));
     document.getElementById('reset-view').addEventListener('click', resetView);
     document.getElementById('toggle-labels').addEventListener('click', toggleLabels);
+    document.getElementById('layout-server').addEventListener('click', () => setLayout('server'));
     document.getElementById('layout-force').addEventListener('click', () => setLayout('force'));
     document.getElementById('layout-circular').addEventListener('click', () => setLayout('circular'));
+    document.getElementById('show-clusters').addEventListener('click', () => loadGraphData(null));
 }
 
 // Handle paper form submission
@@ -122,7 +134,7 @@ async function handlePaperSubmission(event) {
         if (response.ok) {
             showNotification('Paper added successfully!', 'success');
             event.target.reset();
-            await loadGraphData();
+            await refreshGraph();
         } else {
             showNotification(result.error || 'Error adding paper', 'error');
         }
@@ -145,11 +157,11 @@ function handleFileDrop(event) {
     if (files.length > 0) {
         const file = files[0];
         if (file.type === 'text/csv' || file.type === 'application/json' || 
-            file.name.endsWith('.csv') || file.name.endsWith('.json')) {
+            /\.(csv|json|ndjson|jsonl)$/.test(file.name)) {
             selectedFile = file;
             updateFileUploadUI(file.name);
         } else {
-            showNotification('Please select a CSV or JSON file', 'error');
+            showNotification('Please select a CSV, JSON or NDJSON file', 'error');
         }
     }
 }
@@ -190,7 +202,7 @@ async function handleFileUpload() {
             selectedFile = null;
             document.querySelector('#file-upload p').textContent = 'Drop your CSV or JSON file here, or click to select';
             document.getElementById('upload-btn').style.display = 'none';
-            await loadGraphData();
+            await refreshGraph();
         } else {
             showNotification(result.error || 'Error uploading file', 'error');
         }
@@ -201,16 +213,27 @@ async function handleFileUpload() {
     }
 }
 
-// Load graph data from API
-async function loadGraphData() {
+// Load graph data from API; large graphs arrive as clusters that can be opened one at a time
+async function loadGraphData(cluster = currentCluster) {
     try {
         showLoading(true);
-        const response = await fetch('/api/graph');
+        const url = cluster !== null ? `/api/graph?cluster=${cluster}` : '/api/graph';
+        const response = await fetch(url);
         const data = await response.json();
 
         if (response.ok) {
             nodes = data.nodes;
             links = data.links;
+            fitLayoutTransform(nodes);
+            nodes.forEach(takeServerPosition);
+            placeNearNeighbours(links);
+            configureForces(activeLayout());
+            graphStats = data.stats || null;
+            graphVersion = data.version;
+            layoutGeneration = data.layout !== undefined ? data.layout : null;
+            graphView = data.view;
+            currentCluster = data.view === 'cluster' ? data.cluster : null;
+            document.getElementById('show-clusters').style.display = currentCluster !== null ? 'inline-block' : 'none';
             updateGraph();
             updateStatistics();
         } else {
@@ -223,49 +246,150 @@ async function loadGraphData() {
     }
 }
 
-// Update the graph visualization
-function updateGraph() {
-    // Clear existing elements
-    g.selectAll('.link').remove();
-    g.selectAll('.node').remove();
-    g.selectAll('.label').remove();
+// Fetch only what changed since the loaded version; clustered views are reloaded
+async function refreshGraph() {
+    if (graphView !== 'full' || graphVersion === null) {
+        await loadGraphData();
+        return;
+    }
+
+    try {
+        // A new layout generation means every node moved; the server then asks for a reload
+        const layoutParam = layoutGeneration !== null ? `&layout=${layoutGeneration}` : '';
+        const response = await fetch(`/api/graph/changes?since=${graphVersion}${layoutParam}`);
+        const data = await response.json();
+
+        if (!response.ok) {
+            showNotification(data.error || 'Error loading graph changes', 'error');
+        } else if (data.reset) {
+            await loadGraphData();
+        } else {
+            applyGraphChanges(data);
+        }
+    } catch (error) {
+        showNotification('Network error: ' + error.message, 'error');
+    }
+}
+
+// Map server layout coordinates into the viewport; the transform is kept so patched nodes line up
+function fitLayoutTransform(items) {
+    const placed = items.filter(n => n.x !== undefined);
+    if (placed.length === 0) {
+        layoutTransform = null;
+        return;
+    }
+
+    const margin = 40;
+    const [minX, maxX] = d3.extent(placed, n => n.x);
+    const [minY, maxY] = d3.extent(placed, n => n.y);
+    const scale = Math.min((width - 2 * margin) / Math.max(maxX - minX, 1e-9),
+                           (height - 2 * margin) / Math.max(maxY - minY, 1e-9));
+    const offsetX = (width - (maxX - minX) * scale) / 2;
+    const offsetY = (height - (maxY - minY) * scale) / 2;
+    layoutTransform = {
+        x: value => offsetX + (value - minX) * scale,
+        y: value => offsetY + (value - minY) * scale
+    };
+}
+
+// Keep the server position as layoutX/layoutY and use it unless another layout is active
+function takeServerPosition(node) {
+    if (node.x !== undefined && layoutTransform) {
+        node.layoutX = layoutTransform.x(node.x);
+        node.layoutY = layoutTransform.y(node.y);
+    }
+    delete node.x;
+    delete node.y;
+    if (activeLayout() === 'server' && node.layoutX !== undefined) {
+        node.x = node.layoutX;
+        node.y = node.layoutY;
+    }
+    return node;
+}
+
+// Start unplaced nodes next to a node they are linked to so the layout settles quickly
+function placeNearNeighbours(newLinks) {
+    const nodesById = new Map(nodes.map(n => [n.id, n]));
+    newLinks.forEach(link => {
+        const source = typeof link.source === 'object' ? link.source : nodesById.get(link.source);
+        const target = typeof link.target === 'object' ? link.target : nodesById.get(link.target);
+        [[source, target], [target, source]].forEach(([placed, added]) => {
+            if (placed && added && placed.x !== undefined && added.x === undefined) {
+                added.x = placed.x + (Math.random() - 0.5) * 20;
+                added.y = placed.y + (Math.random() - 0.5) * 20;
+            }
+        });
+    });
+
+    if (activeLayout() === 'server') {
+        nodes.filter(n => n.x === undefined).forEach(n => {
+            n.x = width / 2 + (Math.random() - 0.5) * 100;
+            n.y = height / 2 + (Math.random() - 0.5) * 100;
+        });
+    }
+}
+
+// The server layout is used whenever the server sent positions
+function activeLayout() {
+    return layoutMode === 'server' && !layoutTransform ? 'force' : layoutMode;
+}
+
+function configureForces(type) {
+    if (type === 'force') {
+        simulation
+            .force('link', d3.forceLink().id(d => d.id).distance(100))
+            .force('charge', d3.forceManyBody().strength(-300))
+            .force('center', d3.forceCenter(width / 2, height / 2))
+            .force('collision', d3.forceCollide().radius(20));
+    } else {
+        // A zero-strength link force still resolves link ends to node objects
+        simulation
+            .force('link', d3.forceLink().id(d => d.id).strength(0))
+            .force('charge', null)
+            .force('center', null)
+            .force('collision', null);
+    }
+}
 
+// Update the graph visualization; existing elements and positions are kept
+function updateGraph(alpha = 1) {
     // Update simulation with new data
     simulation.nodes(nodes);
     simulation.force('link').links(links);
 
     // Create links
-    const link = g.selectAll('.link')
+    const link = linkLayer.selectAll('.link')
         .data(links)
-        .enter().append('line')
+        .join('line')
         .attr('class', d => `link ${d.type}`)
-        .attr('stroke-width', 2);
+        .attr('stroke-width', d => d.type === 'cluster' ? Math.min(8, 1 + Math.log(d.weight)) : 2);
 
     // Create nodes
-    const node = g.selectAll('.node')
-        .data(nodes)
-        .enter().append('circle')
+    const node = nodeLayer.selectAll('.node')
+        .data(nodes, d => d.id)
+        .join(enter => enter.append('circle')
+            .call(d3.drag()
+                .on('start', dragstarted)
+                .on('drag', dragged)
+                .on('end', dragended))
+            .on('click', handleNodeClick)
+            .on('mouseover', handleNodeMouseOver)
+            .on('mouseout', handleNodeMouseOut))
         .attr('class', d => `node ${d.type}`)
         .attr('r', d => {
             switch(d.type) {
                 case 'paper': return 8;
                 case 'author': return 6;
                 case 'journal': return 10;
+                case 'cluster': return Math.min(40, 6 + 2 * Math.sqrt(d.size));
                 default: return 5;
             }
-        })
-        .call(d3.drag()
-            .on('start', dragstarted)
-            .on('drag', dragged)
-            .on('end', dragended))
-        .on('click', handleNodeClick)
-        .on('mouseover', handleNodeMouseOver)
-        .on('mouseout', handleNodeMouseOut);
+        });
 
     // Create labels
-    const label = g.selectAll('.label')
-        .data(nodes)
-        .enter().append('text')
+    const label = labelLayer.selectAll('.label')
+        .data(nodes, d => d.id)
+        .join('text')
         .attr('class', 'label')
         .style('font-size', '10px')
         .style('font-family', 'Arial, sans-serif')
@@ -276,11 +400,12 @@ function updateGraph() {
         .text(d => {
             const maxLength = 15;
             const text = d.name || d.title || d.id;
-            return text.length > maxLength ? text.substring(0, maxLength) + '...' : text;
+            const shortText = text.length > maxLength ? text.substring(0, maxLength) + '...' : text;
+            return d.type === 'cluster' ? `${shortText} (${d.size})` : shortText;
         });
 
     // Update positions on simulation tick
-    simulation.on('tick', function() {
+    const ticked = function() {
         link
             .attr('x1', d => d.source.x)
             .attr('y1', d => d.source.y)
@@ -294,13 +419,62 @@ function updateGraph() {
         label
             .attr('x', d => d.x)
             .attr('y', d => d.y + 3);
+    };
+    simulation.on('tick', ticked);
+
+    if (activeLayout() === 'server') {
+        // Positions are precomputed: draw once instead of simulating
+        simulation.stop();
+        ticked();
+    } else {
+        simulation.alpha(alpha).restart();
+    }
+}
+
+// Patch the rendered graph with the changes since the loaded version
+function applyGraphChanges(changes) {
+    const nodesById = new Map(nodes.map(n => [n.id, n]));
+
+    changes.nodes.forEach(changed => {
+        const existing = nodesById.get(changed.id);
+        takeServerPosition(changed);
+        if (existing) {
+            Object.assign(existing, changed);
+        } else {
+            nodes.push(changed);
+            nodesById.set(changed.id, changed);
+        }
     });
 
-    simulation.alpha(1).restart();
+    // Links of changed records are dropped; ends are ids, or nodes once simulated
+    const endId = end => typeof end === 'object' ? end.id : end;
+    const linkKey = link => [endId(link.source), endId(link.target), link.type].join('\u0000');
+    const removed = new Set((changes.removed_links || []).map(linkKey));
+    if (removed.size > 0) {
+        links = links.filter(link => !removed.has(linkKey(link)));
+    }
+
+    const newLinks = changes.links.map(link => ({ ...link }));
+    links.push(...newLinks);
+    placeNearNeighbours(newLinks);
+
+    graphVersion = changes.version;
+    layoutGeneration = changes.layout;
+    graphStats = null;
+    updateGraph(0.3);
+    updateStatistics();
 }
 
 // Node interaction handlers
 function handleNodeClick(event, d) {
+    // Open a cluster to show its members
+    if (d.type === 'cluster') {
+        if (d.cluster !== null) {
+            loadGraphData(d.cluster);
+        }
+        return;
+    }
+
     // Remove previous selections
     g.selectAll('.node').classed('selected', false);
     g.selectAll('.link').classed('highlighted', false);
@@ -322,6 +496,14 @@ function handleNodeMouseOver(event, d) {
     let content = `<strong>${d.name || d.title || d.id}</strong><br/>`;
     content += `Type: ${d.type}<br/>`;
     
+    if (d.type === 'cluster') {
+        content += `Members: ${d.size}<br/>`;
+        Object.entries(d.counts).forEach(([type, count]) => {
+            content += `${type}s: ${count}<br/>`;
+        });
+        if (d.cluster !== null) content += 'Click to open';
+    }
+
     if (d.type === 'paper') {
         if (d.year) content += `Year: ${d.year}<br/>`;
         if (d.journal) content += `Journal: ${d.journal}<br/>`;
@@ -395,18 +577,21 @@ function toggleLabels() {
 }
 
 function setLayout(type) {
-    if (type === 'force') {
-        simulation
-            .force('link', d3.forceLink().id(d => d.id).distance(100))
-            .force('charge', d3.forceManyBody().strength(-300))
-            .force('center', d3.forceCenter(width / 2, height / 2))
-            .force('collision', d3.forceCollide().radius(20));
-    } else if (type === 'circular') {
-        simulation
-            .force('link', null)
-            .force('charge', null)
-            .force('collision', null);
+    layoutMode = type;
+    configureForces(activeLayout());
+    nodes.forEach(node => {
+        node.fx = null;
+        node.fy = null;
+    });
 
+    if (type === 'server') {
+        nodes.filter(node => node.layoutX !== undefined).forEach(node => {
+            node.x = node.layoutX;
+            node.y = node.layoutY;
+            node.vx = 0;
+            node.vy = 0;
+        });
+    } else if (type === 'circular') {
         const radius = Math.min(width, height) / 2 - 50;
         const angleStep = (2 * Math.PI) / nodes.length;
 
@@ -417,10 +602,10 @@ function setLayout(type) {
         });
     }
 
-    simulation.alpha(1).restart();
+    updateGraph();
 
     // Update button states
-    document.querySelectorAll('#layout-force, #layout-circular').forEach(btn => {
+    document.querySelectorAll('#layout-server, #layout-force, #layout-circular').forEach(btn => {
         btn.classList.remove('active');
     });
     document.getElementById(`layout-${type}`).classList.add('active');
@@ -428,10 +613,11 @@ function setLayout(type) {
 
 // Update statistics
 function updateStatistics() {
-    const paperCount = nodes.filter(n => n.type === 'paper').length;
-    const authorCount = nodes.filter(n => n.type === 'author').length;
-    const journalCount = nodes.filter(n => n.type === 'journal').length;
-    const citationCount = links.filter(l => l.type === 'cites').length;
+    // Totals come from the server because only part of a large graph is rendered
+    const paperCount = graphStats ? graphStats.papers : nodes.filter(n => n.type === 'paper').length;
+    const authorCount = graphStats ? graphStats.authors : nodes.filter(n => n.type === 'author').length;
+    const journalCount = graphStats ? graphStats.journals : nodes.filter(n => n.type === 'journal').length;
+    const citationCount = graphStats ? graphStats.citations : links.filter(l => l.type === 'cites').length;
 
     document.getElementById('papers-count').textContent = paperCount;
     document.getElementById('authors-count').textContent = authorCount;
@@ -490,15 +676,41 @@ async function queryCitations() {
     }
 }
 
+async function queryRelatedPapers() {
+    const paperTitle = document.getElementById('paper-title-query').value.trim();
+    if (!paperTitle) {
+        showNotification('Please enter a paper title', 'error');
+        return;
+    }
+
+    try {
+        const response = await fetch(`/api/query/related/${encodeURIComponent(paperTitle)}`);
+        const data = await response.json();
+
+        const resultsDiv = document.getElementById('citation-results');
+        
+        if (response.ok) {
+            displayRelatedResults(data, resultsDiv);
+        } else {
+            resultsDiv.innerHTML = `<p style="color: red;">${data.error}</p>`;
+        }
+        
+        resultsDiv.style.display = 'block';
+    } catch (error) {
+        showNotification('Network error: ' + error.message, 'error');
+    }
+}
+
 async function queryInfluentialPapers() {
     try {
-        const response = await fetch('/api/influential');
+        const metric = document.getElementById('influence-metric').value;
+        const response = await fetch(`/api/influential?metric=${encodeURIComponent(metric)}`);
         const data = await response.json();
 
         const resultsDiv = document.getElementById('influential-results');
         
         if (response.ok) {
-            displayInfluentialResults(data, resultsDiv);
+            displayInfluentialResults(data, resultsDiv, metric);
         } else {
             resultsDiv.innerHTML = `<p style="color: red;">${data.error}</p>`;
         }
@@ -565,8 +777,37 @@ function displayCitationResults(data, container) {
     container.innerHTML = html;
 }
 
-function displayInfluentialResults(data, container) {
-    let html = '<h3>Most Influential Papers (by citation count)</h3>';
+function displayRelatedResults(data, container) {
+    let html = `<h3>Papers Related to "${data.paper}" (${data.count} found)</h3>`;
+    
+    if (data.related.length === 0) {
+        html += '<p>No related papers found. Papers are related when they share references or are cited together.</p>';
+    } else {
+        data.related.forEach(paper => {
+            html += `
+                <div class="result-item">
+                    <h4>${paper.title}</h4>
+                    <p><strong>Shared References:</strong> ${paper.shared_references} &nbsp; <strong>Co-cited By:</strong> ${paper.co_cited_by}</p>
+                    ${paper.year ? `<p><strong>Year:</strong> ${paper.year}</p>` : ''}
+                    ${paper.journal ? `<p><strong>Journal:</strong> ${paper.journal}</p>` : ''}
+                    ${paper.authors.length > 0 ? `<p><strong>Authors:</strong> ${Array.isArray(paper.authors) ? paper.authors.join(', ') : paper.authors}</p>` : ''}
+                </div>
+            `;
+        });
+    }
+    
+    container.innerHTML = html;
+}
+
+const INFLUENCE_METRIC_LABELS = {
+    citations: 'citation count',
+    pagerank: 'PageRank',
+    authorities: 'HITS authority score',
+    hubs: 'HITS hub score'
+};
+
+function displayInfluentialResults(data, container, metric = 'citations') {
+    let html = `<h3>Most Influential Papers (by ${INFLUENCE_METRIC_LABELS[metric]})</h3>`;
     
     if (data.length === 0) {
         html += '<p>No papers found.</p>';
@@ -576,6 +817,7 @@ function displayInfluentialResults(data, container) {
                 <div class="result-item">
                     <h4>#${index + 1} ${paper.title}</h4>
                     <p><strong>Citation Count:</strong> ${paper.citation_count}</p>
+                    ${metric !== 'citations' ? `<p><strong>Score:</strong> ${paper.score.toFixed(4)}</p>` : ''}
                     ${paper.year ? `<p><strong>Year:</strong> ${paper.year}</p>` : ''}
                     ${paper.journal ? `<p><strong>Journal:</strong> ${paper.journal}</p>` : ''}
                     ${paper.authors.length > 0 ? `<p><strong>Authors:</strong> ${Array.isArray(paper.authors) ? paper.authors.join(', ') : paper.authors}</p>` : ''}
@@ -16,7 +16,6 @@ def test_imports():
     required_modules = [
         'flask',
         'networkx',
-        'pandas',
         'json',
         'csv',
         'io',
@@ -93,6 +92,698 @@ def test_flask_app():
         print(f"✗ Flask test failed: {e}")
         return False
 
+def test_data_generator():
+    """Test the streaming synthetic data generator."""
+    print("\nTesting synthetic data generator...")
+    
+    try:
+        import os
+        import tempfile
+        from generate_test_data import stream_citation_network, stream_as_csv
+        from graph.ingest import iter_csv_papers
+        
+        papers = list(stream_citation_network(2000, seed=7, num_authors=500, num_journals=20))
+        again = list(stream_citation_network(2000, seed=7, num_authors=500, num_journals=20))
+        assert papers == again
+        
+        # Citations only point backwards in time
+        position = {}
+        for i, paper in enumerate(papers):
+            position[paper['title']] = i
+            assert all(position[cited] < i for cited in paper['cited_papers'])
+        
+        # Preferential attachment produces hot spots well above the mean
+        counts = {}
+        for paper in papers:
+            for cited in paper['cited_papers']:
+                counts[cited] = counts.get(cited, 0) + 1
+        mean = sum(counts.values()) / len(papers)
+        assert max(counts.values()) > 20 * mean
+        
+        # Reference counts are capped and generated files parse as uploads
+        capped = list(stream_citation_network(2000, seed=7, num_authors=500, num_journals=20,
+                                              mean_references=50, max_references=60))
+        assert max(len(paper['cited_papers']) for paper in capped) == 60
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'generated.csv')
+            stream_as_csv(capped, path)
+            with open(path, newline='', encoding='utf-8') as f:
+                parsed = list(iter_csv_papers(f))
+        assert [paper['cited_papers'] for paper in parsed] == [paper['cited_papers'] for paper in capped]
+        
+        print("✓ Deterministic, time-ordered, power-law citations")
+        return True
+        
+    except Exception as e:
+        print(f"✗ Data generator test failed: {e}")
+        return False
+
+def test_metrics_endpoint():
+    """Test request instrumentation and the /metrics endpoint."""
+    print("\nTesting metrics endpoint...")
+    
+    try:
+        from collections import Counter
+        from app import app, graph_store
+        
+        with app.test_client() as client:
+            client.post('/api/papers', json={'title': 'Metrics Paper', 'authors': 'Metrics Author',
+                                             'cited_papers': 'Metrics Reference'})
+            client.get('/api/papers')
+            response = client.get('/metrics')
+            assert response.status_code == 200
+            body = response.get_data(as_text=True)
+            assert 'http_request_duration_seconds_count{route="/api/papers",method="GET"}' in body
+            assert '# TYPE graph_nodes gauge' in body
+        
+        # Gauges come from counts the store keeps up to date; they match a full scan
+        with graph_store.read() as graph:
+            nodes = Counter(node_type for _, node_type in graph.nodes(data='type', default='unknown'))
+            edges = Counter(edge_type for _, _, edge_type in graph.edges(data='type', default='unknown'))
+        assert graph_store.type_counts() == (dict(nodes), dict(edges))
+        
+        print("✓ Per-route latency histograms exposed on /metrics")
+        return True
+        
+    except Exception as e:
+        print(f"✗ Metrics test failed: {e}")
+        return False
+
+def test_request_profiling():
+    """Test the opt-in profiling hook."""
+    print("\nTesting request profiling...")
+    
+    try:
+        from app import app
+        
+        profiler = app.extensions['request_profiler']
+        profiler.token = 'test-token'
+        with app.test_client() as client:
+            # Without the token the request is served normally
+            response = client.get('/api/influential?profile=cprofile')
+            assert 'X-Profile-Id' not in response.headers
+            # A non-ASCII token is rejected, not an error
+            response = client.get('/api/papers', headers={'X-Profile': 'cprofile', 'X-Profile-Token': 'tökén'})
+            assert response.status_code == 200 and 'X-Profile-Id' not in response.headers
+            
+            response = client.get('/api/influential',
+                                  headers={'X-Profile': 'cprofile', 'X-Profile-Token': 'test-token',
+                                           'X-Profile-Output': 'inline'})
+            report = response.get_json()['profile']
+            assert report['profiler'] == 'cprofile'
+            assert any('get_influential_papers' in f['function'] for f in report['functions'])
+            
+            # Streamed bodies are rendered under the profiler
+            response = client.get('/api/export/csv',
+                                  headers={'X-Profile': 'cprofile', 'X-Profile-Token': 'test-token',
+                                           'X-Profile-Output': 'inline'})
+            report = response.get_json()['profile']
+            assert any('iter_csv_export' in f['function'] for f in report['functions'])
+        
+        print("✓ Token-protected per-request profiling")
+        return True
+        
+    except Exception as e:
+        print(f"✗ Profiling test failed: {e}")
+        return False
+
+def test_concurrent_graph_access():
+    """Test that readers can iterate the graph while uploads write to it."""
+    print("\nTesting concurrent graph access...")
+    
+    try:
+        import threading
+        from graph.store import GraphStore
+        from graph.ingest import normalize_paper, add_paper_to_graph
+        
+        store = GraphStore(ingest_batch_size=50)
+        papers = [normalize_paper({'title': f'Paper {i}', 'authors': f'Author {i % 7}',
+                                   'cited_papers': f'Paper {i // 2}'}) for i in range(2000)]
+        errors = []
+        done = threading.Event()
+        
+        def reader():
+            while not done.is_set():
+                try:
+                    with store.read() as graph:
+                        sum(1 for _ in graph.edges(data=True))
+                except Exception as e:
+                    errors.append(e)
+        
+        readers = [threading.Thread(target=reader) for _ in range(4)]
+        for thread in readers:
+            thread.start()
+        store.apply(papers, add_paper_to_graph)
+        done.set()
+        for thread in readers:
+            thread.join()
+        
+        assert not errors, errors[0]
+        assert store.version == 40
+        assert store.graph.nodes['Paper 3']['authors'] == ['Author 3']
+        
+        print("✓ Readers-writer locked graph store")
+        return True
+        
+    except Exception as e:
+        print(f"✗ Concurrency test failed: {e}")
+        return False
+
+def test_shared_graph_snapshots():
+    """Test that request stores send writes to the writer and share its versions."""
+    print("\nTesting shared graph snapshots...")
+    
+    try:
+        import tempfile
+        import threading
+        import time
+        from graph.shared import GraphWriter, SharedGraphStore
+        from graph.ingest import normalize_paper, add_paper_to_graph
+        
+        with tempfile.TemporaryDirectory() as directory:
+            # Two stores on one directory behave like two worker processes
+            writer = GraphWriter(directory)
+            threading.Thread(target=writer.serve, daemon=True).start()
+            worker = SharedGraphStore(directory)
+            reader = SharedGraphStore(directory)
+            try:
+                while writer._listener is None:
+                    time.sleep(0.01)
+                worker.apply([normalize_paper({'title': 'Paper A', 'authors': 'Author X',
+                                               'journal': 'Journal Y', 'cited_papers': 'Paper B'})],
+                             add_paper_to_graph)
+                
+                assert reader.version == worker.version == writer.version == 1
+                with reader.read() as graph:
+                    assert graph.has_node('Paper B')
+                    assert graph.nodes['Paper A']['authors'] == ['Author X']
+                    assert list(graph.predecessors('Paper B')) == ['Paper A']
+                    assert sorted(t for _, _, t in graph.edges(data='type')) == ['cites', 'published_in', 'wrote']
+                
+                # Only one writer may own the directory
+                try:
+                    GraphWriter(directory)
+                    assert False, "second writer started"
+                except BlockingIOError:
+                    pass
+            finally:
+                writer.close()
+            
+            # A restarted writer continues from the published snapshot
+            writer = GraphWriter(directory)
+            writer.apply([normalize_paper({'title': 'Paper C', 'cited_papers': 'Paper A'})], add_paper_to_graph)
+            writer.close()
+            assert reader.version == 2
+            assert reader.type_counts()[1]['cites'] == 2
+            assert reader.changes_since(1) == (['Paper C'], [('Paper C', 'Paper A', 'cites')], [])
+            assert reader.changes_since(0, max_records=4) is None
+            
+            # A changed record drops its stale edges from the published snapshot
+            writer = GraphWriter(directory)
+            writer.apply([normalize_paper({'title': 'Paper C', 'cited_papers': 'Paper B'})], add_paper_to_graph)
+            writer.close()
+            with reader.read() as graph:
+                assert list(graph.successors('Paper C')) == ['Paper B']
+            assert reader.changes_since(2)[2] == [('Paper C', 'Paper A', 'cites')]
+        
+        print("✓ Memory-mapped snapshots published by a single writer")
+        return True
+        
+    except Exception as e:
+        print(f"✗ Shared graph test failed: {e}")
+        return False
+
+def test_shared_analytics():
+    """Test that shared-mode workers read the analytics the writer computed once."""
+    print("\nTesting shared analytics...")
+    
+    try:
+        import tempfile
+        import threading
+        import time
+        import numpy as np
+        from graph.shared import GraphWriter, SharedGraphStore
+        from graph.ingest import normalize_paper, add_paper_to_graph
+        from analytics.shared import SharedAnalytics
+        
+        with tempfile.TemporaryDirectory() as directory:
+            # Without a serving writer nothing computes analytics
+            try:
+                SharedAnalytics(SharedGraphStore(directory)).get('rankings')
+                assert False, "analytics without a writer"
+            except RuntimeError:
+                pass
+            
+            writer = GraphWriter(directory)
+            threading.Thread(target=writer.serve, daemon=True).start()
+            try:
+                while writer._listener is None:
+                    time.sleep(0.01)
+                store = SharedGraphStore(directory)
+                store.apply([normalize_paper({'title': f'Shared {i}', 'authors': f'Author {i % 3}',
+                                              'cited_papers': f'Shared {i - 1}' if i else ''})
+                             for i in range(30)], add_paper_to_graph)
+                
+                # Two workers get the same results, with no job running in either
+                workers = [SharedAnalytics(SharedGraphStore(directory), max_wait=30) for _ in range(2)]
+                results = [(worker.get('communities'), worker.get('layout')) for worker in workers]
+                (communities, version, stale), (layout, _, _) = results[0]
+                assert version == store.version == 1 and not stale
+                assert results[1][0][0]['labels'].tolist() == communities['labels'].tolist()
+                assert results[1][1][0]['generation'] == layout['generation']
+                assert np.array_equal(results[1][1][0]['positions'], layout['positions'])
+                assert not layout['positions'].flags.writeable
+                
+                # The next version follows the write
+                store.apply([normalize_paper({'title': 'Shared 30', 'cited_papers': 'Shared 0'})],
+                            add_paper_to_graph)
+                rankings, version, stale = workers[0].get('rankings')
+                assert version == 2 and not stale
+            finally:
+                writer.close()
+        
+        print("✓ Analytics computed once by the writer and shared by every worker")
+        return True
+        
+    except Exception as e:
+        print(f"✗ Shared analytics test failed: {e}")
+        return False
+
+def test_graph_analytics():
+    """Test PageRank, HITS and h-index on a small citation graph."""
+    print("\nTesting graph analytics...")
+    
+    try:
+        from graph.store import GraphStore
+        from graph.ingest import normalize_paper, add_paper_to_graph
+        from analytics.engine import AnalyticsEngine
+        import numpy as np
+        from analytics.ranking import compute_rankings, compute_author_impact
+        
+        papers = [
+            {'title': 'Hub', 'authors': ['Alice']},
+            {'title': 'P1', 'authors': ['Alice', 'Bob'], 'cited_papers': ['Hub']},
+            {'title': 'P2', 'authors': ['Alice'], 'cited_papers': ['Hub', 'P1']},
+            {'title': 'P3', 'authors': ['Bob'], 'cited_papers': ['Hub', 'P1', 'P3']},
+        ]
+        store = GraphStore(nx.MultiDiGraph())
+        store.apply([normalize_paper(p) for p in papers], add_paper_to_graph)
+        engine = AnalyticsEngine(store)
+        engine.register('rankings', compute_rankings)
+        engine.register('author_impact', compute_author_impact)
+        
+        rankings, version, stale = engine.get('rankings')
+        assert version == store.version and not stale
+        top = lambda metric: rankings['papers'][rankings['order'][metric][0]]
+        assert top('citations') == top('pagerank') == top('authorities') == 'Hub'
+        assert abs(rankings['pagerank'].sum() - 1.0) < 1e-9
+        # Self-citations are ignored
+        assert rankings['citations'][rankings['papers'].index('P3')] == 0
+        
+        impact, _, _ = engine.get('author_impact')
+        h_index = dict(zip(impact['authors'], impact['h_index'].tolist()))
+        assert h_index == {'Alice': 2, 'Bob': 1}
+        
+        # Warm-started HITS stays finite when every citing paper had a zero hub score
+        store = GraphStore(nx.MultiDiGraph())
+        engine = AnalyticsEngine(store)
+        engine.register('rankings', compute_rankings)
+        store.apply([normalize_paper({'title': 'P', 'cited_papers': ['Q']})], add_paper_to_graph)
+        engine.get('rankings')
+        store.apply([normalize_paper({'title': 'P'}), normalize_paper({'title': 'Q', 'cited_papers': ['P']})],
+                    add_paper_to_graph)
+        rankings, _, _ = engine.get('rankings')
+        assert all(np.isfinite(rankings[metric]).all() for metric in ('hubs', 'authorities', 'pagerank'))
+        assert rankings['papers'][rankings['order']['hubs'][0]] == 'Q'
+        
+        print("✓ Vectorized rankings and h-index computed per graph version")
+        return True
+        
+    except Exception as e:
+        print(f"✗ Graph analytics test failed: {e}")
+        return False
+
+def test_related_papers():
+    """Test related papers from bibliographic coupling and co-citation."""
+    print("\nTesting related papers...")
+    
+    try:
+        from graph.store import GraphStore
+        from graph.ingest import normalize_paper, add_paper_to_graph
+        from analytics.engine import AnalyticsEngine
+        from analytics.similarity import compute_related, lookup_related
+        
+        papers = [
+            {'title': 'A', 'cited_papers': ['X', 'Y']},
+            {'title': 'B', 'cited_papers': ['X', 'Y', 'Z']},
+            {'title': 'C', 'cited_papers': ['Z']},
+            {'title': 'D', 'cited_papers': ['X']},
+        ]
+        store = GraphStore(nx.MultiDiGraph())
+        store.apply([normalize_paper(p) for p in papers], add_paper_to_graph)
+        engine = AnalyticsEngine(store)
+        engine.register('related', compute_related)
+        related, _, _ = engine.get('related')
+        
+        # B shares two references with A (coupling)
+        assert lookup_related(related, 'A', 10) == [('B', 2.0, 2, 0), ('D', 1.0, 1, 0)]
+        # X and Y are cited together by A and B (co-citation)
+        assert lookup_related(related, 'Y', 1) == [('X', 2.0, 0, 2)]
+        assert lookup_related(related, 'Unknown', 10) == []
+        
+        # Blocks of single rows give the same result
+        from analytics.matrix import GraphMatrices
+        from analytics.similarity import related_papers
+        with store.read() as graph:
+            matrices = GraphMatrices.from_graph(graph, store.version)
+        citations, _ = matrices.citations
+        whole, rows = related_papers(citations), related_papers(citations, max_block_entries=1)
+        assert all((whole[key] == rows[key]).all() for key in ('indptr', 'indices', 'scores'))
+        # X, cited by three papers, is a hub above max_link_degree=2 and is ignored
+        hubless = compute_related(matrices, max_link_degree=2)
+        assert lookup_related(hubless, 'A', 10) == [('B', 1.0, 1, 0)]
+        
+        print("✓ Related papers ranked by shared references and co-citations")
+        return True
+        
+    except Exception as e:
+        print(f"✗ Related papers test failed: {e}")
+        return False
+
+def test_graph_communities():
+    """Test community detection and the clustered graph view."""
+    print("\nTesting graph communities...")
+    
+    try:
+        from app import app, graph_store
+        from graph.ingest import normalize_paper, add_paper_to_graph
+        
+        # Two groups of authors citing only within their group
+        papers = []
+        for group in ('A', 'B'):
+            for i in range(5):
+                papers.append(normalize_paper({
+                    'title': f'{group}{i}',
+                    'authors': [f'{group} Author {i}', f'{group} Author {(i + 1) % 5}'],
+                    'journal': f'Journal {group}',
+                    'cited_papers': [f'{group}{j}' for j in range(i)]
+                }))
+        graph_store.apply(papers, add_paper_to_graph)
+        
+        with app.test_client() as client:
+            response = client.get('/api/graph?view=clusters')
+            assert response.headers['X-Analytics-Stale'] in ('true', 'false')
+            clusters = response.get_json()
+            assert clusters['view'] == 'clusters'
+            groups = [node for node in clusters['nodes'] if node['size'] == 11]
+            assert len(groups) == 2
+            # Limits below one still show the largest community
+            clamped = client.get('/api/graph?view=clusters&limit=-3').get_json()
+            assert clamped['nodes'][0]['id'] == 'cluster:0'
+            
+            drill_in = client.get(f"/api/graph?cluster={groups[0]['cluster']}").get_json()
+            members = {node['id'] for node in drill_in['nodes'] if node['type'] == 'paper'}
+            assert members in ({f'A{i}' for i in range(5)}, {f'B{i}' for i in range(5)})
+            assert drill_in['stats']['papers'] >= 10
+        
+        print("✓ Communities aggregated into clusters with drill-in")
+        return True
+        
+    except Exception as e:
+        print(f"✗ Graph communities test failed: {e}")
+        return False
+
+def test_graph_changes():
+    """Test that clients can fetch only the changes since their version."""
+    print("\nTesting graph change log...")
+    
+    try:
+        from app import app
+        
+        with app.test_client() as client:
+            version = client.get('/api/graph?view=full').get_json()['version']
+            client.post('/api/papers', json={'title': 'Delta Paper', 'authors': 'Delta Author',
+                                             'cited_papers': 'Delta Reference'})
+            
+            changes = client.get(f'/api/graph/changes?since={version}').get_json()
+            assert changes['version'] == version + 1 and not changes['reset']
+            assert [node['id'] for node in changes['nodes']] == ['Delta Paper', 'Delta Author', 'Delta Reference']
+            assert {(link['source'], link['type']) for link in changes['links']} == {
+                ('Delta Author', 'wrote'), ('Delta Paper', 'cites')}
+            
+            assert client.get(f"/api/graph/changes?since={changes['version']}").get_json()['nodes'] == []
+            assert client.get('/api/graph/changes?since=-1').get_json()['reset']
+        
+        # Deltas over the record limit are not merged; the client reloads instead
+        from graph.changes import ChangeLog
+        log = ChangeLog()
+        log.append(1, ['a'], [])
+        log.append(2, ['b', 'c'], [('b', 'c', 'cites')])
+        assert log.since(0, 2, max_records=3) is None
+        assert log.since(1, 2, max_records=3) == (['b', 'c'], [('b', 'c', 'cites')], [])
+        # An edge removed and added back within the range is no change at all
+        log.append(3, ['b'], [], [('b', 'c', 'cites'), ('b', 'd', 'cites')])
+        log.append(4, ['b'], [('b', 'c', 'cites')])
+        assert log.since(2, 4) == (['b'], [], [('b', 'd', 'cites')])
+        assert log.since(1, 4)[1:] == ([('b', 'c', 'cites')], [('b', 'd', 'cites')])
+        
+        print("✓ Change log returns only the deltas since a version")
+        return True
+        
+    except Exception as e:
+        print(f"✗ Graph change log test failed: {e}")
+        return False
+
+def test_graph_layout():
+    """Test server-side positions and their incremental update."""
+    print("\nTesting graph layout...")
+    
+    try:
+        from app import app, graph_store
+        from graph.ingest import normalize_paper, add_paper_to_graph
+        
+        with app.test_client() as client:
+            before = client.get('/api/graph?view=full').get_json()
+            assert all('x' in node and 'y' in node for node in before['nodes'])
+            positions = {node['id']: (node['x'], node['y']) for node in before['nodes']}
+            
+            client.post('/api/papers', json={'title': 'Layout Paper', 'authors': 'Layout Author',
+                                             'cited_papers': 'Delta Paper'})
+            after = client.get('/api/graph?view=full').get_json()
+            placed = {node['id']: (node['x'], node['y']) for node in after['nodes']}
+            assert 'Layout Paper' in placed
+            # Existing nodes keep their positions; only the new ones are placed
+            assert all(placed[node] == position for node, position in positions.items())
+            assert after['layout'] == before['layout']
+            
+            # Adding more nodes than the graph has forces a full relayout, which patches cannot express
+            graph_store.apply([normalize_paper({'title': f'Relayout Paper {i}'}) for i in range(len(placed) + 1)],
+                              add_paper_to_graph)
+            changes = client.get(f"/api/graph/changes?since={after['version']}&layout={after['layout']}").get_json()
+            assert changes['reset']
+            assert client.get('/api/graph?view=full').get_json()['layout'] > after['layout']
+        
+        print("✓ Layout positions served and kept stable across writes")
+        return True
+        
+    except Exception as e:
+        print(f"✗ Graph layout test failed: {e}")
+        return False
+
+def test_graph_export():
+    """Test that CSV and NDJSON exports rebuild the same graph."""
+    print("\nTesting graph export...")
+    
+    try:
+        import io
+        from collections import Counter
+        from app import app, graph_store
+        from graph.store import GraphStore
+        import tempfile
+        from xml.etree import ElementTree
+        from graph.shared import GraphWriter, SharedGraphStore
+        from graph.export import export_source, iter_ndjson_export, iter_graphml_export
+        from graph.ingest import iter_csv_text, iter_ndjson_papers, normalize_paper, add_paper_to_graph
+        
+        def contents(graph):
+            return dict(graph.nodes(data=True)), Counter(graph.edges(data='type'))
+        
+        with app.test_client() as client:
+            client.post('/api/papers', json={'title': 'Export Paper', 'authors': ['Doe, J.', 'Roe, R.'],
+                                             'year': '2024', 'cited_papers': ['Comma, Title']})
+            with graph_store.read() as graph:
+                expected = contents(graph)
+            
+            readers = {'csv': iter_csv_text,
+                       'ndjson': lambda text: iter_ndjson_papers(io.StringIO(text))}
+            for export_format, read_papers in readers.items():
+                response = client.get(f'/api/export/{export_format}')
+                assert response.status_code == 200 and response.is_streamed
+                imported = GraphStore()
+                imported.apply(read_papers(response.get_data(as_text=True)), add_paper_to_graph)
+                assert contents(imported.graph) == expected, export_format
+            
+            graphml = client.get('/api/export/graphml').get_data(as_text=True)
+            assert graphml.count('<node ') == len(expected[0])
+            assert client.get('/api/export/xml').status_code == 400
+            # Locked-mode chunks read the live graph, so no single version is claimed
+            assert 'X-Graph-Version' not in client.get('/api/export/csv').headers
+        
+        def changing_export(store, apply, iter_export):
+            """Export one record per chunk, with a write after the first chunk."""
+            apply([normalize_paper({'title': 'Chunk A', 'cited_papers': 'Ref A'}),
+                   normalize_paper({'title': 'Chunk B', 'cited_papers': 'Ref B'})], add_paper_to_graph)
+            read, version = export_source(store)
+            chunks = iter_export(read, chunk_size=1)
+            text = next(chunks) + next(chunks)
+            apply([normalize_paper({'title': 'Chunk B', 'cited_papers': 'Late Ref'})], add_paper_to_graph)
+            return version, text + ''.join(chunks)
+        
+        # A shared-mode export renders every chunk from the snapshot it started on
+        with tempfile.TemporaryDirectory() as directory:
+            writer = GraphWriter(directory)
+            try:
+                version, text = changing_export(SharedGraphStore(directory), writer.apply, iter_ndjson_export)
+            finally:
+                writer.close()
+            assert version == 1 and 'Ref B' in text and 'Late Ref' not in text
+        
+        # A locked-mode GraphML export never refers to nodes it did not list
+        store = GraphStore()
+        version, text = changing_export(store, store.apply, iter_graphml_export)
+        root = ElementTree.fromstring(text)
+        listed = {node.get('id') for node in root.iter('{http://graphml.graphdrawing.org/xmlns}node')}
+        edges = list(root.iter('{http://graphml.graphdrawing.org/xmlns}edge'))
+        assert version is None and 'Late Ref' not in listed and edges
+        assert all(edge.get('source') in listed and edge.get('target') in listed for edge in edges)
+        
+        print("✓ CSV and NDJSON exports round-trip; GraphML lists every node; exports stay consistent")
+        return True
+        
+    except Exception as e:
+        print(f"✗ Graph export test failed: {e}")
+        return False
+
+def test_idempotent_upload():
+    """Test that re-uploading the same data neither duplicates edges nor writes."""
+    print("\nTesting idempotent uploads...")
+    
+    try:
+        import io
+        from app import app, graph_store
+        
+        csv_data = ('title,authors,journal,year,cited_papers\n'
+                    '"Upsert Paper","Upsert Author","Upsert Journal",2024,"Upsert Reference"\n'
+                    '"Upsert Reference","Upsert Author","Upsert Journal",2020,""\n')
+        
+        def upload(data):
+            response = app.test_client().post('/api/upload',
+                                              data={'file': (io.BytesIO(data.encode()), 'upsert.csv')})
+            with graph_store.read() as graph:
+                return response.get_json()['message'], graph.number_of_edges(), graph_store.version
+        
+        _, edges, version = upload(csv_data)
+        message, edges_again, version_again = upload(csv_data)
+        assert (edges_again, version_again) == (edges, version)
+        assert 'Added 0 papers' in message and 'Skipped 2 unchanged' in message
+        
+        message, edges_changed, _ = upload(csv_data.replace('2024', '2025'))
+        assert 'Added 1 papers' in message and edges_changed == edges
+        with graph_store.read() as graph:
+            assert graph.nodes['Upsert Paper']['year'] == '2025'
+            assert len(graph.get_edge_data('Upsert Author', 'Upsert Paper')) == 1
+        
+        # A changed record replaces its authors, journal and citations
+        changed = csv_data.replace('"Upsert Paper","Upsert Author","Upsert Journal",2024,"Upsert Reference"',
+                                   '"Upsert Paper","Other Author","Other Journal",2024,""')
+        _, _, version = upload(csv_data)
+        upload(changed)
+        with graph_store.read() as graph:
+            assert not graph.has_edge('Upsert Author', 'Upsert Paper')
+            assert not graph.has_edge('Upsert Paper', 'Upsert Journal')
+            assert not graph.has_edge('Upsert Paper', 'Upsert Reference')
+            assert graph.has_edge('Other Author', 'Upsert Paper')
+        changes = app.test_client().get(f'/api/graph/changes?since={version}').get_json()
+        # Other tests may have grown the graph past the full view, which only resets
+        if not changes['reset']:
+            assert {(link['source'], link['target']) for link in changes['removed_links']} == {
+                ('Upsert Author', 'Upsert Paper'), ('Upsert Paper', 'Upsert Journal'),
+                ('Upsert Paper', 'Upsert Reference')}
+        
+        print("✓ Unchanged papers skipped and edges never duplicated")
+        return True
+        
+    except Exception as e:
+        print(f"✗ Idempotent upload test failed: {e}")
+        return False
+
+def test_app_factory():
+    """Test that the application factory builds working apps without heavy imports."""
+    print("\nTesting application factory...")
+    
+    try:
+        from app import app, create_app
+        
+        fresh = create_app()
+        assert fresh is not app
+        with fresh.test_client() as client:
+            assert client.get('/api/papers').status_code == 200
+            assert client.get('/metrics').status_code == 200
+        # Unused at runtime, so never imported at startup
+        assert 'pandas' not in sys.modules
+        # Analytics load numpy and scipy on first use; a fresh interpreter shows what startup imports
+        import os
+        import subprocess
+        startup = subprocess.run([sys.executable, '-c', "import sys, app; print(sorted({'numpy', 'scipy'} & set(sys.modules)))"],
+                                 cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True)
+        assert startup.stdout.split()[-1] == '[]'
+        
+        print("✓ create_app() builds an app serving the shared graph")
+        return True
+        
+    except Exception as e:
+        print(f"✗ Application factory test failed: {e}")
+        return False
+
+def test_parallel_parsing():
+    """Test that sharded multi-process parsing matches serial parsing."""
+    print("\nTesting parallel parsing...")
+    
+    try:
+        import csv
+        import io
+        import tempfile
+        from graph.ingest import iter_csv_text
+        from graph.parallel import parse_file
+        
+        # Quoted newlines (LF and CRLF) and quotes must not be mistaken for record boundaries
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(['title', 'authors', 'journal', 'year', 'cited_papers'])
+        for i in range(2000):
+            title = f'Shard Paper {i}' + ('\nsubtitle' if i % 4 == 0 else '\r\nsubtitle' if i % 4 == 1 else
+                                          ' "quoted"' if i % 4 == 2 else '')
+            writer.writerow([title, f'Author {i % 50}, Author {i % 7}', 'Journal', 2000 + i % 20,
+                             f'Shard Paper {i - 1}'])
+        
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', newline='', encoding='utf-8') as f:
+            f.write(buffer.getvalue())
+            f.flush()
+            parallel = parse_file(f.name, 'csv', workers=2, min_shard_bytes=4096)
+        
+        # The same parse the app runs for uploads below PARALLEL_INGEST_MIN_BYTES
+        serial = list(iter_csv_text(buffer.getvalue()))
+        assert len(parallel) == 2000 and parallel == serial
+        # Universal newlines inside quoted fields too, so CRLF and LF titles match
+        assert parallel[1]['title'] == 'Shard Paper 1\nsubtitle'
+        
+        print("✓ Byte-range shards parsed in parallel match serial parsing")
+        return True
+        
+    except Exception as e:
+        print(f"✗ Parallel parsing test failed: {e}")
+        return False
+
 def test_file_structure():
     """Test that all required files exist."""
     print("\nTesting file structure...")
@@ -133,6 +824,21 @@ def main():
         test_imports,
         test_networkx,
         test_flask_app,
+        test_data_generator,
+        test_metrics_endpoint,
+        test_request_profiling,
+        test_concurrent_graph_access,
+        test_shared_graph_snapshots,
+        test_shared_analytics,
+        test_graph_analytics,
+        test_related_papers,
+        test_graph_communities,
+        test_graph_changes,
+        test_graph_layout,
+        test_graph_export,
+        test_idempotent_upload,
+        test_app_factory,
+        test_parallel_parsing,
         test_file_structure
     ]
     